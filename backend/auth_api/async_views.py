@@ -0,0 +1,231 @@
+"""
+ASGI native login, token, refresh and logout views.
+
+The same flows as the DRF views in `views.py`, which an ASGI server runs
+through a sync_to_async hop per request. Database and cache calls use the
+async APIs, password hashing runs in the hashing process pool and token
+signing on a bounded thread pool, so they don't block the event loop.
+Errors are rendered like `ViewRenderer` does.
+"""
+import asyncio, functools, json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.utils.timezone import now
+from django.views import View
+from rest_framework.exceptions import Throttled
+from core_db.hashing import HashingUnavailable
+from core_db.roles import get_user_role
+from .serializers import UserTokenRefreshSerializer
+from .tokens import UserRefreshToken
+from .utils import EmailOtp, LoginSession
+from .views import LoginView as DRFLoginView, user_validity_error, record_failed_login
+
+
+executor = ThreadPoolExecutor(max_workers=settings.ASYNC_VIEW_EXECUTOR_WORKERS, thread_name_prefix="auth")
+
+
+def call_blocking(func, *args):
+    """Run a blocking call with the connection handling of a request."""
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+async def run_blocking(func, *args):
+    """Run a blocking call, e.g. hashing or signing, on the bounded thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(call_blocking, func, *args))
+
+def error_response(error, status=400):
+    return JsonResponse({"errors": error}, status=status)
+
+def unavailable_response(exc):
+    response = error_response(exc.detail, exc.status_code)
+    response["Retry-After"] = str(exc.wait)
+    return response
+
+def issue_tokens(user):
+    """Create the refresh and access tokens of the user with their role."""
+    refresh = UserRefreshToken.for_user(user)
+    return str(refresh), str(refresh.access_token), get_user_role(user)
+
+def refresh_tokens(refresh_token):
+    """Rotate the refresh token, returns the new tokens and the user id."""
+    serializer = UserTokenRefreshSerializer(data={"refresh": refresh_token})
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    user_id = UserRefreshToken(data["refresh"], verify=False).get('user_id', None)
+
+    return data["refresh"], data["access"], user_id
+
+def blacklist_token(refresh_token):
+    UserRefreshToken(refresh_token).blacklist()
+
+def token_response(user, refresh, access, role):
+    return JsonResponse({
+        "access_token_expiry": (now() + timedelta(minutes=5)).isoformat(),
+        "user_role": role,
+        "user_id": user.id,
+        "access_token": access,
+        "refresh_token": refresh,
+    })
+
+async def get_valid_user(**lookup):
+    """Return the user and why they can't login, None if they can."""
+    user = await get_user_model().objects.filter(**lookup).afirst()
+    return user, user_validity_error(user)
+
+async def get_session_user(user_id):
+    """Return the user of a login session and the session error, None if valid."""
+    if not user_id:
+        return None, "Session expired. Please login again."
+
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None, "Invalid Session"
+
+    user, error = await get_valid_user(id=user_id)
+    if not user:
+        return None, "Invalid Session"
+
+    return user, error
+
+class AsyncAPIView(View):
+    """Async view reading JSON or form request data."""
+    http_method_names = ['post', 'options']
+
+    def get_data(self, request):
+        if request.content_type == 'application/json':
+            return json.loads(request.body or b'{}')
+        return request.POST.dict()
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.data = self.get_data(request)
+        except ValueError:
+            return error_response("Invalid JSON.")
+
+        return await super().dispatch(request, *args, **kwargs)
+
+class LoginView(AsyncAPIView):
+    """Async Login View."""
+
+    async def post(self, request, *args, **kwargs):
+        """Verify the credentials and send an OTP to the registered email."""
+        try:
+            email = request.data.get('email')
+            password = request.data.get('password')
+
+            if not email or not password:
+                return error_response("Email and password are required")
+
+            user, error = await get_valid_user(email=email)
+            if error:
+                return error_response(error)
+
+            if not await user.acheck_password(password):
+                return error_response(await sync_to_async(record_failed_login)(user))
+
+            # The email_otp throttle of the DRF view, sharing its rate
+            try:
+                await run_blocking(DRFLoginView().throttle_otp, request, user)
+            except Throttled as e:
+                return error_response(e.detail, e.status_code)
+
+            # Reset failed login attempts
+            if user.failed_login_attempts > 0:
+                await get_user_model().objects.filter(pk=user.pk).aupdate(failed_login_attempts=0)
+
+            # Generate OTP
+            otp = EmailOtp.generate_otp()
+            if not await run_blocking(EmailOtp.send_email_otp, email, otp):
+                return JsonResponse(
+                    {"errors": "Something went wrong, could not send OTP. Try again", "otp": False}, status=400
+                )
+
+            await LoginSession.astart(user.id, otp, email, password)
+            return JsonResponse({"success": "Email sent", "otp": True, "user_id": user.id})
+
+        except HashingUnavailable as e:
+            return unavailable_response(e)
+        except Exception as e:
+            return error_response(str(e), 500)
+
+class TokenView(AsyncAPIView):
+    """Async Token View."""
+
+    async def post(self, request, *args, **kwargs):
+        """Verify the OTP and issue the JWT tokens."""
+        try:
+            user, error = await get_session_user(request.data.get("user_id"))
+            if error:
+                return error_response(error)
+
+            # Get the OTP, email and password from the login session
+            session = await LoginSession.aget(user.id)
+            if not session:
+                return error_response("Session expired. Please login again.")
+
+            if not EmailOtp.verify_otp(session["otp"], request.data.get("otp")):
+                return error_response("Invalid OTP")
+
+            # End the session, so a concurrent request with the same OTP can't use it.
+            # A resend may have started another session since, its OTP wasn't verified.
+            verified, session = session, await LoginSession.apop(user.id)
+            if not session or session["issued_at"] != verified["issued_at"]:
+                return error_response("Session expired. Please login again.")
+
+            if not await user.acheck_password(session["password"]):
+                return error_response("No active account found with the given credentials", 401)
+
+            refresh, access, role = await run_blocking(issue_tokens, user)
+            return token_response(user, refresh, access, role)
+
+        except HashingUnavailable as e:
+            return unavailable_response(e)
+        except Exception as e:
+            return error_response(str(e), 500)
+
+class RefreshTokenView(AsyncAPIView):
+    """Async Refresh Token View."""
+
+    async def post(self, request, *args, **kwargs):
+        """Rotate the refresh token and issue a new access token."""
+        refresh_token = request.data.get("refresh")
+        if not refresh_token:
+            return error_response("Tokens are required")
+
+        try:
+            refresh, access, user_id = await run_blocking(refresh_tokens, refresh_token)
+        except Exception:
+            return error_response("Invalid refresh token", 401)
+
+        user, error = await get_session_user(user_id)
+        if error:
+            return error_response(error)
+
+        role = await sync_to_async(get_user_role)(user)
+        return token_response(user, refresh, access, role)
+
+class LogoutView(AsyncAPIView):
+    """Async Logout View."""
+
+    async def post(self, request, *args, **kwargs):
+        """Logout by blacklisting the refresh token."""
+        refresh_token = request.data.get("refresh")
+        if not refresh_token:
+            return error_response("Tokens are required")
+
+        try:
+            await run_blocking(blacklist_token, refresh_token)
+        except Exception as e:
+            return error_response(str(e), 500)
+
+        return JsonResponse({"success": "Logged out successfully"})
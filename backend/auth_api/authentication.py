@@ -0,0 +1,63 @@
+"""Authentication classes for Auth API."""
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from .tokens import USER_CLAIMS
+
+
+class TokenClaimsUser(TokenUser):
+    """
+    Lightweight user built from the claims of a validated access token.
+    Attributes which are not carried by the token are read from the user
+    row, which is only loaded the first time such an attribute is used.
+    """
+
+    @cached_property
+    def is_active(self):
+        return self.token.get('is_active', False)
+
+    @cached_property
+    def role(self):
+        return self.token.get('role')
+
+    @cached_property
+    def instance(self):
+        """The full user model instance (costs one query)."""
+        return get_user_model().objects.get(**{api_settings.USER_ID_FIELD: self.id})
+
+    def __getattr__(self, attr):
+        """Read custom claims from the token, anything else from the user row."""
+        if attr.startswith('_') or attr in ('token', 'instance'):
+            raise AttributeError(attr)
+
+        if attr in self.token:
+            return self.token[attr]
+
+        return getattr(self.instance, attr)
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication which does not fetch the user row on every request.
+    The user is built from the claims embedded at issue time, tokens issued
+    without those claims fall back to the database lookup.
+    """
+
+    def get_user(self, validated_token):
+        """Return a token backed user for the validated token."""
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = TokenClaimsUser(validated_token)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
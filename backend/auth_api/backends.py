@@ -0,0 +1,89 @@
+"""Token backend signing with the key ring."""
+import jwt
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError
+from rest_framework_simplejwt.settings import api_settings
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """
+    Token backend which stamps the `kid` of the signing key on issued tokens
+    and verifies tokens with the key (and algorithm) matching their `kid`.
+    """
+
+    def __init__(self, keyring):
+        super().__init__(
+            keyring.algorithm,
+            keyring.signing_key,
+            keyring.verifying_key,
+            api_settings.AUDIENCE,
+            api_settings.ISSUER,
+            api_settings.JWK_URL,
+            api_settings.LEEWAY,
+            api_settings.JSON_ENCODER,
+        )
+        self.keyring = keyring
+
+    def encode(self, payload):
+        """Returns an encoded token for the payload, signed with the active key."""
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload["aud"] = self.audience
+        if self.issuer is not None:
+            jwt_payload["iss"] = self.issuer
+
+        return jwt.encode(
+            jwt_payload,
+            self.signing_key,
+            algorithm=self.algorithm,
+            headers={"kid": self.keyring.signing_kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def get_verifying_key(self, token):
+        """Look up the verifying key by the `kid` header of the token."""
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError as ex:
+            raise TokenBackendError(_("Token is invalid or expired")) from ex
+
+        kid = header.get("kid")
+        if kid is None:
+            # Tokens issued before the kid header was added
+            verifying_key = self.keyring.find_verifying_key(header.get("alg"))
+        else:
+            verifying_key = self.keyring.get_verifying_key(kid)
+
+        if verifying_key is None:
+            raise TokenBackendError(_("Token is invalid or expired"))
+
+        return verifying_key
+
+    def decode(self, token, verify=True):
+        """
+        Validates the token with the algorithm of its verifying key and
+        returns its payload dictionary.
+        """
+        verifying_key = self.get_verifying_key(token)
+
+        try:
+            return jwt.decode(
+                token,
+                verifying_key.key,
+                algorithms=[verifying_key.algorithm],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.get_leeway(),
+                options={
+                    "verify_aud": self.audience is not None,
+                    "verify_signature": verify,
+                },
+            )
+        except jwt.InvalidAlgorithmError as ex:
+            raise TokenBackendError(_("Invalid algorithm specified")) from ex
+        except jwt.InvalidTokenError as ex:
+            raise TokenBackendError(_("Token is invalid or expired")) from ex
+
+token_backend = KeyRingTokenBackend(settings.JWT_KEYRING)
@@ -0,0 +1,167 @@
+"""
+Bloom filter front for the refresh token blacklist.
+
+Almost every refresh token checked against the blacklist is not on it.
+Each process keeps a bloom filter of the blacklisted jtis, so only the
+probable hits are looked up in the database. The filter is filled
+incrementally from the blacklist table, by primary key, and updated right
+away when this process blacklists a token.
+
+Tokens blacklisted by other processes are seen after at most
+`BLACKLIST_FILTER_MAX_STALENESS` seconds.
+"""
+import hashlib, logging, math, threading, time
+from django.conf import settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """Fixed size bloom filter of strings sized for a false positive rate."""
+
+    def __init__(self, size_bytes, false_positive_rate):
+        self.size = size_bytes * 8
+        # Entries held before the false positive rate goes over the target
+        self.capacity = int(self.size * math.log(2) ** 2 / -math.log(false_positive_rate))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray(size_bytes)
+
+    def _positions(self, item):
+        """Bit positions of the item, double hashing of one digest."""
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        """Add the item, returns False when it was probably already present."""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                added = True
+
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, item):
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                return False
+        return True
+
+    @staticmethod
+    def size_for(capacity, false_positive_rate):
+        """Bytes holding the number of entries at the false positive rate."""
+        return math.ceil(capacity * -math.log(false_positive_rate) / math.log(2) ** 2 / 8)
+
+    @property
+    def expected_false_positive_rate(self):
+        """False positive rate expected for the current number of entries."""
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+
+class BlacklistFilter:
+    """Per process bloom filter of the blacklisted jtis with lookup metrics."""
+
+    def __init__(self, memory=None, false_positive_rate=None, max_staleness=None):
+        self.memory = memory or settings.BLACKLIST_FILTER_MEMORY
+        self.false_positive_rate = false_positive_rate or settings.BLACKLIST_FILTER_FALSE_POSITIVE_RATE
+        self.max_staleness = settings.BLACKLIST_FILTER_MAX_STALENESS if max_staleness is None else max_staleness
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Empty the filter, it is filled again from the table on the next check."""
+        with self._lock:
+            self._bloom = BloomFilter(self.memory, self.false_positive_rate)
+            self._last_id = 0
+            self._synced_at = None
+            self.checks = self.negatives = self.hits = self.false_positives = 0
+
+    def _is_fresh(self):
+        return self._synced_at is not None and time.monotonic() - self._synced_at < self.max_staleness
+
+    def _rebuild(self):
+        """
+        Empty filter for the live blacklisted jtis, with room for as many again.
+        It is larger than the configured memory when they don't fit in it.
+        """
+        live = BlacklistedToken.objects.count()
+        memory = max(self.memory, BloomFilter.size_for(2 * live, self.false_positive_rate))
+        if memory > self.memory:
+            logger.warning(
+                "%d blacklisted tokens don't fit in BLACKLIST_FILTER_MEMORY, the filter uses %d bytes", live, memory
+            )
+        return BloomFilter(memory, self.false_positive_rate)
+
+    def sync(self, force=False):
+        """Add the jtis blacklisted since the last sync, at most once per `max_staleness` seconds."""
+        if not force and self._is_fresh():
+            return
+
+        with self._lock:
+            # Synced by another thread while this one waited
+            if not force and self._is_fresh():
+                return
+
+            bloom, last_id = self._bloom, self._last_id
+            # Pruned tokens stay in the filter, start over once it is full. The
+            # new filter is only swapped in once filled, readers don't take the lock.
+            if bloom.count > bloom.capacity:
+                bloom, last_id = self._rebuild(), 0
+
+            rows = (
+                BlacklistedToken.objects.filter(pk__gt=last_id)
+                .order_by("pk").values_list("pk", "token__jti")
+            )
+            for pk, jti in rows.iterator(chunk_size=2000):
+                bloom.add(jti)
+                last_id = pk
+
+            self._bloom, self._last_id = bloom, last_id
+            self._synced_at = time.monotonic()
+
+    def add(self, jti):
+        """Add a jti blacklisted by this process."""
+        with self._lock:
+            self._bloom.add(jti)
+
+    def might_contain(self, jti):
+        """False when the jti is certainly not blacklisted."""
+        self.sync()
+        self.checks += 1
+        if jti in self._bloom:
+            return True
+
+        self.negatives += 1
+        return False
+
+    def record(self, blacklisted):
+        """Record whether a probable hit was confirmed by the database."""
+        if blacklisted:
+            self.hits += 1
+        else:
+            self.false_positives += 1
+
+    def stats(self):
+        """Size and lookup metrics of the filter."""
+        checked_negatives = self.negatives + self.false_positives
+        return {
+            "memory": len(self._bloom._bits),
+            "entries": self._bloom.count,
+            "capacity": self._bloom.capacity,
+            "hash_count": self._bloom.hash_count,
+            "checks": self.checks,
+            "database_checks": self.hits + self.false_positives,
+            "hits": self.hits,
+            "false_positives": self.false_positives,
+            "false_positive_rate": self.false_positives / checked_negatives if checked_negatives else 0.0,
+            "expected_false_positive_rate": self._bloom.expected_false_positive_rate,
+        }
+
+blacklist_filter = BlacklistFilter()
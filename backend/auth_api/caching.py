@@ -0,0 +1,29 @@
+"""Atomic cache helpers for values read once."""
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.redis import RedisCache
+
+
+def pop(key):
+    """
+    Get and delete a key atomically, None when it is missing. Only one of
+    concurrent callers gets the value: GETDEL on Redis, and elsewhere the
+    caller whose delete removed the key.
+    """
+    # `cache` is a proxy, the backend itself tells whether it is Redis
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if isinstance(backend, RedisCache):
+        key = backend.make_and_validate_key(key)
+        value = backend._cache.get_client(key, write=True).getdel(key)
+        return None if value is None else backend._cache._serializer.loads(value)
+
+    value = cache.get(key)
+    if value is not None and cache.delete(key):
+        return value
+    return None
+
+async def apop(key):
+    """Async `pop`, the caller whose delete removed the key gets the value."""
+    value = await cache.aget(key)
+    if value is not None and await cache.adelete(key):
+        return value
+    return None
@@ -0,0 +1,81 @@
+"""
+Precompiled email templates.
+
+The text and HTML templates in `templates/emails` are parsed once at
+startup. Values known at startup, like the app name, are rendered into the
+static parts right away, so sending a mail only joins the static parts with
+the escaped per mail values, without the Django template engine.
+"""
+import html, os, re
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates", "emails")
+VARIABLE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+def no_escape(value):
+    return value
+
+class CompiledTemplate:
+    """Template split once into static text and the slots of its variables."""
+
+    def __init__(self, source, static_context=None, escape=no_escape):
+        static_context = static_context or {}
+        self.escape = escape
+        parts = [""]
+        slots = []
+        position = 0
+        for match in VARIABLE.finditer(source):
+            parts[-1] += source[position:match.start()]
+            name = match.group(1)
+            if name in static_context:
+                parts[-1] += escape(str(static_context[name]))
+            else:
+                slots.append((len(parts), name))
+                parts.extend((None, ""))
+            position = match.end()
+        parts[-1] += source[position:]
+
+        self.parts = parts
+        self.slots = slots
+        self.variables = {name for _, name in slots}
+
+    def render(self, **context):
+        """Interpolate the variables in the static parts."""
+        pieces = list(self.parts)
+        for index, name in self.slots:
+            pieces[index] = self.escape(str(context[name]))
+        return "".join(pieces)
+
+class EmailTemplate:
+    """Subject, text and HTML templates of a multipart mail."""
+
+    def __init__(self, name, subject, static_context=None):
+        self.name = name
+        self.subject = subject
+        with open(os.path.join(TEMPLATE_DIR, f"{name}.txt")) as text_file:
+            self.text = CompiledTemplate(text_file.read().rstrip("\n"), static_context)
+        with open(os.path.join(TEMPLATE_DIR, f"{name}.html")) as html_file:
+            self.html = CompiledTemplate(html_file.read(), static_context, escape=html.escape)
+
+    def render(self, to, **context):
+        """Return the multipart message for the recipient."""
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.text.render(**context),
+            to=[to]
+        )
+        message.attach_alternative(self.html.render(**context), "text/html")
+        return message
+
+STATIC_CONTEXT = {"app_name": settings.APP_NAME}
+
+EMAIL_TEMPLATES = {
+    template.name: template for template in (
+        EmailTemplate("login_otp", "2 Factor Login Authentication", STATIC_CONTEXT),
+        EmailTemplate("email_verification", "Verify Your Email", STATIC_CONTEXT),
+        EmailTemplate("password_reset", "Reset Your Password", STATIC_CONTEXT),
+    )
+}
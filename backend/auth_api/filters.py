@@ -1,6 +1,7 @@
 import django_filters
-from django.db.models import Q
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from .search import search_users
 
 
 class UserFilter(django_filters.FilterSet):
@@ -14,9 +15,12 @@ class UserFilter(django_filters.FilterSet):
         fields = ('search', 'is_active', 'group')
         
     def filter_email_or_username(self, queryset, name, value):
-        """Filter users where email OR username contains the search value."""
-        return queryset.filter(Q(email__icontains=value) | Q(username__icontains=value))
+        """Filter users where email OR username contains the search value, ranked."""
+        return search_users(queryset, value)
         
     def filter_by_group(self, queryset, name, value):
-        """FIlter users by group name."""
-        return queryset.filter(groups__name__iexact=value.strip())
\ No newline at end of file
+        """
+        FIlter users by group name.
+        The groups are matched first so the links are found through their group_id index.
+        """
+        return queryset.filter(groups__in=Group.objects.filter(name__iexact=value.strip()))
\ No newline at end of file
@@ -0,0 +1,250 @@
+"""
+Outbound mail queue.
+
+Mails are written to a spool directory and sent by a thread pool, so the
+views return without waiting on SMTP. The mails spooled while the workers
+are busy are sent together over one connection. Failed sends are retried with an
+exponential backoff. A mail is claimed by renaming its spool file, so it is
+sent once even when several processes share the spool. Mails left in the
+spool by a stopped process are sent by `manage.py send_queued_mail`.
+"""
+import json, logging, os, threading, time, uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+
+def serialize_message(message):
+    """Return the fields of an email message as a JSON compatible dictionary."""
+    return {
+        "subject": message.subject,
+        "body": message.body,
+        "from_email": message.from_email,
+        "to": list(message.to),
+        "alternatives": [list(alternative) for alternative in getattr(message, "alternatives", [])],
+    }
+
+def deserialize_message(data):
+    """Build the email message back from its serialized fields."""
+    message = EmailMultiAlternatives(
+        subject=data["subject"],
+        body=data["body"],
+        from_email=data["from_email"],
+        to=data["to"],
+    )
+    for content, mimetype in data["alternatives"]:
+        message.attach_alternative(content, mimetype)
+
+    return message
+
+class MailQueue:
+    """Spooled mail queue delivered by a thread pool, with retries and a status per mail."""
+
+    def __init__(self, spool_dir=None, workers=None, max_attempts=None, backoff=None, eager=None):
+        self.spool_dir = spool_dir or settings.MAIL_SPOOL_DIR
+        self.workers = workers or settings.MAIL_QUEUE_WORKERS
+        self.max_attempts = max_attempts or settings.MAIL_MAX_ATTEMPTS
+        self.backoff = settings.MAIL_RETRY_BACKOFF if backoff is None else backoff
+        self.eager = settings.MAIL_QUEUE_EAGER if eager is None else eager
+        self.queue_dir = os.path.join(self.spool_dir, QUEUED)
+        self.sending_dir = os.path.join(self.spool_dir, SENDING)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = deque()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mail")
+            return self._executor
+
+    def reset_executor(self):
+        """Drop the thread pool, e.g. in a forked child where its threads don't exist."""
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = deque()
+
+    def _path(self, directory, mail_id):
+        return os.path.join(directory, f"{mail_id}.json")
+
+    def _makedirs(self, directory):
+        """Create a spool directory, only readable by this user as the mails hold OTPs and links."""
+        os.makedirs(self.spool_dir, mode=0o700, exist_ok=True)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _write(self, path, entry):
+        """Write the spool file atomically, on disk before it replaces the previous one."""
+        self._makedirs(os.path.dirname(path))
+        temp_path = f"{path}.tmp"
+        with os.fdopen(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as spool_file:
+            json.dump(entry, spool_file)
+            spool_file.flush()
+            os.fsync(spool_file.fileno())
+        os.replace(temp_path, path)
+
+    def _set_status(self, mail_id, status, attempts=0, error=None):
+        cache.set(
+            f"mail_status_{mail_id}",
+            {"status": status, "attempts": attempts, "error": error},
+            timeout=settings.MAIL_STATUS_TIMEOUT
+        )
+
+    def _schedule(self, mail_id, delay=0):
+        """Deliver the mail from the thread pool, after `delay` seconds."""
+        if self.eager:
+            self.deliver(mail_id)
+        elif delay:
+            timer = threading.Timer(delay, self._schedule, args=(mail_id,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._pending.append(mail_id)
+            self.executor.submit(self._deliver_pending)
+
+    def _deliver_pending(self):
+        """Send up to MAIL_BATCH_SIZE pending mails, nothing when another worker took them."""
+        batch = []
+        while self._pending and len(batch) < settings.MAIL_BATCH_SIZE:
+            try:
+                batch.append(self._pending.popleft())
+            except IndexError:
+                break
+        if batch:
+            self.deliver_many(batch)
+
+    def enqueue(self, message):
+        """Spool the message and schedule its delivery, returns the mail id."""
+        mail_id = uuid.uuid4().hex
+        self._write(
+            self._path(self.queue_dir, mail_id),
+            {"id": mail_id, "message": serialize_message(message), "attempts": 0}
+        )
+        self._set_status(mail_id, QUEUED)
+        self._schedule(mail_id)
+
+        return mail_id
+
+    def _claim(self, mail_id):
+        """Move the mail to the sending directory, returns its entry, None when claimed by another worker."""
+        sending_path = self._path(self.sending_dir, mail_id)
+        self._makedirs(self.sending_dir)
+        try:
+            os.rename(self._path(self.queue_dir, mail_id), sending_path)
+        except FileNotFoundError:
+            return None
+
+        with open(sending_path) as spool_file:
+            entry = json.load(spool_file)
+
+        entry["attempts"] += 1
+        self._set_status(mail_id, SENDING, entry["attempts"])
+        return entry
+
+    def _failed(self, entry, error):
+        """Put a mail that couldn't be sent back in the queue, given up after the maximum attempts."""
+        mail_id, attempts = entry["id"], entry["attempts"]
+        sending_path = self._path(self.sending_dir, mail_id)
+        if attempts >= self.max_attempts:
+            os.remove(sending_path)
+            self._set_status(mail_id, FAILED, attempts, str(error))
+            return
+
+        self._write(sending_path, entry)
+        os.replace(sending_path, self._path(self.queue_dir, mail_id))
+        self._set_status(mail_id, QUEUED, attempts, str(error))
+        self._schedule(mail_id, self.backoff * 2 ** (attempts - 1))
+
+    def _send(self, connection, entry):
+        """Send a claimed mail on its own, so it gets its own status and retry."""
+        try:
+            connection.send_messages([deserialize_message(entry["message"])])
+        except Exception as ex:
+            self._failed(entry, ex)
+            return
+
+        os.remove(self._path(self.sending_dir, entry["id"]))
+        self._set_status(entry["id"], SENT, entry["attempts"])
+
+    def deliver(self, mail_id):
+        """Send a spooled mail."""
+        self.deliver_many([mail_id])
+
+    def deliver_many(self, mail_ids):
+        """Send spooled mails over one connection."""
+        entries = [entry for entry in map(self._claim, mail_ids) if entry is not None]
+        if not entries:
+            return
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as ex:
+            for entry in entries:
+                self._failed(entry, ex)
+            return
+
+        try:
+            for entry in entries:
+                self._send(connection, entry)
+        finally:
+            connection.close()
+
+    def status(self, mail_id):
+        """Return the status, attempts and last error of a mail, None once forgotten."""
+        return cache.get(f"mail_status_{mail_id}")
+
+    def recover(self):
+        """
+        Deliver the spooled mails, including those a stopped process was
+        sending for longer than `MAIL_SEND_TIMEOUT`. Returns their number.
+        """
+        if os.path.isdir(self.sending_dir):
+            stale_before = time.time() - settings.MAIL_SEND_TIMEOUT
+            for name in os.listdir(self.sending_dir):
+                path = os.path.join(self.sending_dir, name)
+                if name.endswith(".json") and os.path.getmtime(path) < stale_before:
+                    self._makedirs(self.queue_dir)
+                    os.replace(path, os.path.join(self.queue_dir, name))
+
+        if not os.path.isdir(self.queue_dir):
+            return 0
+
+        mail_ids = [name[:-len(".json")] for name in os.listdir(self.queue_dir) if name.endswith(".json")]
+        batch_size = settings.MAIL_BATCH_SIZE
+        for start in range(0, len(mail_ids), batch_size):
+            batch = mail_ids[start:start + batch_size]
+            if self.eager:
+                self.deliver_many(batch)
+            else:
+                self.executor.submit(self.deliver_many, batch)
+
+        return len(mail_ids)
+
+    def join(self):
+        """Wait for the scheduled deliveries to finish."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+mail_queue = MailQueue()
+os.register_at_fork(after_in_child=mail_queue.reset_executor)
+
+def send_mail_message(message):
+    """Queue the message for delivery, returns the mail id, None when it couldn't be spooled."""
+    try:
+        return mail_queue.enqueue(message)
+    except OSError as ex:
+        logger.error("Could not spool mail: %s", ex)
+        return None
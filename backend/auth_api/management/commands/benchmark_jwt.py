@@ -0,0 +1,71 @@
+"""Django command to benchmark JWT signing and verification"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.backends import TokenBackend
+from backend.keys import read_key_file, generate_private_key
+
+
+class Command(BaseCommand):
+    """
+    Django command comparing the per-token cost of PEM and pre-parsed keys,
+    and the single core throughput of each signing algorithm.
+    """
+    help = "Benchmark JWT sign/verify cost per key format and per algorithm."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tokens", type=int, default=500, help="Number of tokens signed and verified per run")
+        parser.add_argument(
+            "--algorithms", nargs="+", default=["RS256", "ES256", "EdDSA"],
+            help="Algorithms compared for throughput, signed with freshly generated keys"
+        )
+
+    def _run(self, backend, count):
+        """Sign then verify `count` tokens, return the per-token times in seconds."""
+        payload = {"user_id": 1, "token_type": "access", "exp": int(time.time()) + 300}
+
+        start = time.perf_counter()
+        tokens = [backend.encode(payload) for _ in range(count)]
+        sign_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for token in tokens:
+            backend.decode(token)
+        verify_time = time.perf_counter() - start
+
+        return sign_time / count, verify_time / count
+
+    def _compare_key_formats(self, count):
+        algorithm = settings.SIMPLE_JWT["ALGORITHM"]
+        backends = {
+            "PEM strings": TokenBackend(
+                algorithm,
+                read_key_file(settings.PRIVATE_KEY_PATH).decode(),
+                read_key_file(settings.PUBLIC_KEY_PATH).decode(),
+            ),
+            "Pre-parsed keys": TokenBackend(algorithm, settings.PRIVATE_KEY, settings.PUBLIC_KEY),
+        }
+
+        self.stdout.write(f"Configured key ({algorithm}), {count} tokens per run")
+        results = {}
+        for name, backend in backends.items():
+            sign, verify = results[name] = self._run(backend, count)
+            self.stdout.write(f"  {name:<16} sign: {sign * 1e6:10.1f} us/token   verify: {verify * 1e6:10.1f} us/token")
+
+        pem_sign, pem_verify = results["PEM strings"]
+        key_sign, key_verify = results["Pre-parsed keys"]
+        self.stdout.write(self.style.SUCCESS(
+            f"  Speedup sign: {pem_sign / key_sign:.2f}x   verify: {pem_verify / key_verify:.2f}x"
+        ))
+
+    def _compare_algorithms(self, algorithms, count):
+        self.stdout.write(f"Throughput per core, {count} tokens per run")
+        for algorithm in algorithms:
+            private_key = generate_private_key(algorithm)
+            backend = TokenBackend(algorithm, private_key, private_key.public_key())
+            sign, verify = self._run(backend, count)
+            self.stdout.write(f"  {algorithm:<8} sign: {1 / sign:10.0f} tokens/s   verify: {1 / verify:10.0f} tokens/s")
+
+    def handle(self, *args, **options):
+        self._compare_key_formats(options["tokens"])
+        self._compare_algorithms(options["algorithms"], options["tokens"])
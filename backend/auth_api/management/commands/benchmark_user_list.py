@@ -0,0 +1,72 @@
+"""Django command to benchmark the serialization of the users list pages"""
+import random, statistics, time
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand
+from auth_api.serializers import UserListSerializer, UserRowSerializer
+from .benchmark_user_search import DOMAIN, synthetic_user
+
+
+class Command(BaseCommand):
+    """
+    Django command timing the users list pages serialized from model
+    instances with UserListSerializer against the values() rows with
+    UserRowSerializer. Synthetic users on the bench.invalid domain are
+    inserted first and deleted afterwards unless --keep is given.
+    """
+    help = "Benchmark the users list serialization on synthetic users."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000, help="Synthetic users inserted before the run")
+        parser.add_argument("--pages", type=int, default=200, help="Timed pages per serializer")
+        parser.add_argument("--page-size", type=int, default=50, help="Users per page")
+        parser.add_argument("--keep", action="store_true", help="Keep the synthetic users for the next run")
+
+    def populate(self, count):
+        User = get_user_model()
+        existing = User.objects.filter(email__endswith=f"@{DOMAIN}").count()
+        rng = random.Random(existing)
+        group = Group.objects.get_or_create(name="Default")[0]
+        start = time.perf_counter()
+        for offset in range(existing, count, 10000):
+            users = [synthetic_user(index, rng) for index in range(offset, min(offset + 10000, count))]
+            User.objects.bulk_create(users)
+            emails = [user.email for user in users]
+            User.groups.through.objects.bulk_create([
+                User.groups.through(user_id=pk, group_id=group.pk)
+                for pk in User.objects.filter(email__in=emails).values_list("pk", flat=True)
+            ])
+        if count > existing:
+            self.stdout.write(f"Inserted {count - existing} synthetic users in {time.perf_counter() - start:.1f}s")
+
+    def measure(self, queryset, serializer_class, offsets, page_size):
+        """Median time in milliseconds to read and serialize a page"""
+        timings = []
+        for offset in offsets:
+            start = time.perf_counter()
+            serializer_class(queryset[offset:offset + page_size], many=True).data
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        self.populate(options["users"])
+        synthetic = User.objects.filter(email__endswith=f"@{DOMAIN}")
+        page_size = options["page_size"]
+
+        try:
+            rng = random.Random(0)
+            offsets = [rng.randrange(max(1, options["users"] - page_size)) for _ in range(options["pages"])]
+            instances = synthetic.only(*UserRowSerializer.columns).prefetch_related("groups")
+            rows = synthetic.values(*UserRowSerializer.columns)
+
+            self.stdout.write(f"{'serializer':<20} {'per page':>12} {'rows/s':>10}")
+            for name, queryset, serializer_class in (
+                ("UserListSerializer", instances, UserListSerializer),
+                ("UserRowSerializer", rows, UserRowSerializer),
+            ):
+                elapsed = self.measure(queryset, serializer_class, offsets, page_size)
+                self.stdout.write(f"{name:<20} {elapsed:>9.2f} ms {page_size / elapsed * 1000:>10.0f}")
+        finally:
+            if not options["keep"]:
+                synthetic.delete()
@@ -0,0 +1,70 @@
+"""Django command to benchmark the user search over a synthetic user table"""
+import random, statistics, time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils.text import slugify
+from django.utils.timezone import now
+from auth_api.search import search_users
+
+
+DOMAIN = "bench.invalid"
+SYLLABLES = ("al", "be", "cor", "dan", "el", "fa", "gi", "han", "is", "jo", "ka", "lu", "mar", "ni", "os", "pe", "ra", "sa", "ti", "vo")
+
+
+def synthetic_user(index, rng):
+    name = "".join(rng.choice(SYLLABLES) for _ in range(3))
+    email = f"{name}.{index}@{DOMAIN}"
+    return get_user_model()(
+        email=email, username=email, slug=slugify(email), password="!", last_failed_login_time=now()
+    )
+
+class Command(BaseCommand):
+    """
+    Django command timing the user search against the plain icontains
+    filter it replaced. Synthetic users on the bench.invalid domain are
+    inserted first and deleted afterwards unless --keep is given.
+    """
+    help = "Benchmark the user search over a synthetic user table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000000, help="Synthetic users inserted before the run")
+        parser.add_argument("--terms", nargs="+", default=["ma", "cor", "danel", "12345", "isjo.9"], help="Searched values")
+        parser.add_argument("--rounds", type=int, default=5, help="Timed runs per term")
+        parser.add_argument("--page-size", type=int, default=50, help="Rows fetched per search, like a list page")
+        parser.add_argument("--keep", action="store_true", help="Keep the synthetic users for the next run")
+
+    def populate(self, count):
+        User = get_user_model()
+        existing = User.objects.filter(email__endswith=f"@{DOMAIN}").count()
+        rng = random.Random(existing)
+        start = time.perf_counter()
+        for offset in range(existing, count, 10000):
+            users = [synthetic_user(index, rng) for index in range(offset, min(offset + 10000, count))]
+            User.objects.bulk_create(users)
+        if count > existing:
+            self.stdout.write(f"Inserted {count - existing} synthetic users in {time.perf_counter() - start:.1f}s")
+
+    def measure(self, queryset, rounds, page_size):
+        """Median time in milliseconds to fetch a page"""
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            list(queryset.values_list("id", flat=True)[:page_size])
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        self.populate(options["users"])
+
+        try:
+            self.stdout.write(f"{'term':<12} {'icontains':>12} {'search':>12}")
+            for term in options["terms"]:
+                plain = User.objects.filter(Q(email__icontains=term) | Q(username__icontains=term))
+                before = self.measure(plain, options["rounds"], options["page_size"])
+                after = self.measure(search_users(User.objects.all(), term), options["rounds"], options["page_size"])
+                self.stdout.write(f"{term:<12} {before:>9.1f} ms {after:>9.1f} ms")
+        finally:
+            if not options["keep"]:
+                User.objects.filter(email__endswith=f"@{DOMAIN}").delete()
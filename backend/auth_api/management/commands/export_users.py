@@ -0,0 +1,36 @@
+"""Django command to export the users as CSV or NDJSON"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from auth_api.exports import EXPORT_FORMATS, stream_export
+from auth_api.filters import UserFilter
+
+
+class Command(BaseCommand):
+    """
+    Django command streaming the users to a file or stdout with the same
+    filters as the users list, reading them in chunks.
+    """
+    help = "Export the users as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument("--output", help="File written, defaults to stdout")
+        parser.add_argument("--search", help="Email or username containing the value")
+        parser.add_argument("--is-active", choices=("true", "false"))
+        parser.add_argument("--group", help="Group name")
+
+    def handle(self, *args, **options):
+        data = {name: options[name] for name in ("search", "is_active", "group") if options[name]}
+        filterset = UserFilter(data, queryset=get_user_model().objects.all())
+        if not filterset.is_valid():
+            raise CommandError(filterset.errors.as_text())
+
+        blocks = stream_export(filterset.qs, options["format"])
+        if not options["output"]:
+            for block in blocks:
+                self.stdout.write(block, ending="")
+            return
+
+        with open(options["output"], "w", newline="", encoding="utf-8") as output:
+            for block in blocks:
+                output.write(block)
@@ -0,0 +1,94 @@
+"""Django command to compare the token refresh throughput of the WSGI and ASGI views"""
+import asyncio, time
+import aiohttp
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.crypto import get_random_string
+from django.core.management.base import BaseCommand, CommandError
+from auth_api.tokens import UserRefreshToken
+
+
+class Command(BaseCommand):
+    """
+    Django command load testing the DRF refresh view behind a WSGI server
+    against the async refresh view behind an ASGI server, e.g.
+
+        gunicorn backend.wsgi -w 4 -b :8000
+        uvicorn backend.asgi:application --workers 4 --port 8001
+        python manage.py load_test --email user@example.com
+
+    Both servers must use this database. Each client chains the refresh
+    tokens it gets back, as rotation blacklists the previous one.
+    """
+    help = "Compare requests/sec of the token refresh view on WSGI and ASGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", required=True, help="User the refresh tokens are issued for")
+        parser.add_argument("--wsgi-url", default="http://127.0.0.1:8000", help="Base URL of the WSGI server")
+        parser.add_argument("--asgi-url", default="http://127.0.0.1:8001", help="Base URL of the ASGI server")
+        parser.add_argument("--concurrency", type=int, default=20, help="Concurrent clients")
+        parser.add_argument("--duration", type=float, default=10, help="Seconds per run")
+
+    async def _client(self, session, url, refresh, deadline, latencies, errors):
+        """Refresh in a loop until the deadline, chaining the rotated tokens."""
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                async with session.post(url, json={"refresh": refresh}) as response:
+                    if response.status != 200:
+                        # The token chain of this client is broken
+                        errors.append(response.status)
+                        return
+                    data = await response.json()
+            except (aiohttp.ClientError, ValueError):
+                errors.append(None)
+                return
+
+            latencies.append(time.perf_counter() - start)
+            refresh = data["refresh_token"]
+
+    async def _run(self, url, tokens, duration):
+        latencies, errors = [], []
+        deadline = time.perf_counter() + duration
+        # The views are CSRF protected, send a matching cookie and header
+        csrf_token = get_random_string(32)
+        headers = {"X-CSRFToken": csrf_token, "Cookie": f"{settings.CSRF_COOKIE_NAME}={csrf_token}"}
+        async with aiohttp.ClientSession(headers=headers) as session:
+            await asyncio.gather(*(
+                self._client(session, url, refresh, deadline, latencies, errors) for refresh in tokens
+            ))
+        return latencies, errors
+
+    def _report(self, name, latencies, errors, duration):
+        latencies.sort()
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f"  {name:<5} no successful requests, {len(errors)} errors"))
+            return 0
+
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        rate = len(latencies) / duration
+        self.stdout.write(
+            f"  {name:<5} {rate:8.1f} req/s   p50: {p50 * 1000:7.1f} ms   p99: {p99 * 1000:7.1f} ms   errors: {len(errors)}"
+        )
+        return rate
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(email=options["email"]).first()
+        if not user:
+            raise CommandError(f"No user with the email {options['email']}")
+
+        targets = {
+            "WSGI": f"{options['wsgi_url'].rstrip('/')}/auth-api/token/refresh/",
+            "ASGI": f"{options['asgi_url'].rstrip('/')}/auth-api/async/token/refresh/",
+        }
+        self.stdout.write(f"{options['concurrency']} clients, {options['duration']}s per run")
+
+        rates = {}
+        for name, url in targets.items():
+            tokens = [str(UserRefreshToken.for_user(user)) for _ in range(options["concurrency"])]
+            latencies, errors = asyncio.run(self._run(url, tokens, options["duration"]))
+            rates[name] = self._report(name, latencies, errors, options["duration"])
+
+        if rates["WSGI"] and rates["ASGI"]:
+            self.stdout.write(self.style.SUCCESS(f"  ASGI / WSGI: {rates['ASGI'] / rates['WSGI']:.2f}x"))
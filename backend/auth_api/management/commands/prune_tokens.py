@@ -0,0 +1,34 @@
+"""Django command to delete the expired refresh tokens"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from auth_api.pruning import run_pruning
+
+
+class Command(BaseCommand):
+    """
+    Django command deleting the expired outstanding tokens and their
+    blacklist entries in bounded chunks, once per cluster.
+    """
+    help = "Delete expired refresh tokens in primary key chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.TOKEN_PRUNING_BATCH_SIZE,
+            help="Number of tokens deleted per transaction"
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=settings.TOKEN_PRUNING_SLEEP,
+            help="Seconds to pause between batches"
+        )
+
+    def handle(self, *args, **options):
+        result = run_pruning(batch_size=options["batch_size"], sleep=options["sleep"])
+        if result is None:
+            self.stdout.write(self.style.WARNING("Token pruning is already running elsewhere, skipped"))
+            return
+
+        deleted, elapsed = result
+        rate = deleted / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} expired refresh tokens in {elapsed:.2f}s ({rate:.0f} rows/s)"
+        ))
@@ -0,0 +1,26 @@
+"""Django command to send the spooled mails"""
+import time
+from django.core.management.base import BaseCommand
+from auth_api.mail import mail_queue
+
+
+class Command(BaseCommand):
+    """
+    Django command sending the mails left in the spool, e.g. by a stopped
+    process. With --loop it keeps running as a separate mail worker.
+    """
+    help = "Send the mails waiting in the mail spool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep checking the spool")
+        parser.add_argument("--interval", type=float, default=30, help="Seconds between spool checks with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            count = mail_queue.recover()
+            mail_queue.join()
+            self.stdout.write(f"Processed {count} spooled mail(s)")
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -1,14 +1,81 @@
-import math
-from rest_framework.pagination import PageNumberPagination
+import hashlib, json, math
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from rest_framework.response import Response
 
 
+def approximate_count(queryset):
+    """
+    Count of the queryset without scanning it every time.
+    PostgreSQL returns the planner estimate, exact below USER_APPROXIMATE_COUNT_THRESHOLD
+    where the estimate is unreliable. Other databases count once per USER_COUNT_CACHE_TIMEOUT.
+    """
+    queryset = queryset.order_by()
+    if connections[queryset.db].vendor == 'postgresql':
+        plan = json.loads(queryset.explain(format='json'))
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        if estimate >= settings.USER_APPROXIMATE_COUNT_THRESHOLD:
+            return estimate
+        return queryset.count()
+
+    key = f"user_count_{hashlib.md5(str(queryset.query).encode()).hexdigest()}"
+    return cache.get_or_set(key, queryset.count, timeout=settings.USER_COUNT_CACHE_TIMEOUT)
+
+class ApproximatePage(Page):
+    """Page knowing from its rows whether a next page exists."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator reporting the approximate count and number of pages.
+    The pages are read without the count, so a low estimate doesn't hide the last pages.
+    """
+
+    @cached_property
+    def count(self):
+        return approximate_count(self.object_list)
+
+    def validate_number(self, number):
+        """Any page from 1, pages past the last one are found empty when read."""
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages["invalid_page"])
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        return number
+
+    def page(self, number):
+        """Read one more row than the page to know whether it is the last."""
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages["no_results"])
+        return ApproximatePage(rows[:self.per_page], number, self, has_next=len(rows) > self.per_page)
+
 class UserPagination(PageNumberPagination):
     """Custom pagination class for users."""
     page_size = 2
     page_size_query_param = 'page_size'
     max_page_size = 50
-    
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Use the approximate count with ?count=approximate"""
+        if request.query_params.get('count') == 'approximate':
+            self.django_paginator_class = ApproximateCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
     def get_paginated_response(self, data):
         """Prepare the paginated response."""
         total_count = self.page.paginator.count
@@ -19,4 +86,29 @@ class UserPagination(PageNumberPagination):
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'results': data,
-        })
\ No newline at end of file
+        })
+
+class UserCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the (email, id) ordering, opted in with ?pagination=cursor.
+    Pages are found with an indexed WHERE instead of an OFFSET and the
+    count is approximate, so deep pages cost the same as the first.
+    """
+    page_size = UserPagination.page_size
+    page_size_query_param = UserPagination.page_size_query_param
+    max_page_size = UserPagination.max_page_size
+    ordering = ('email', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = approximate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        """Prepare the paginated response."""
+        return Response({
+            'count': self.count,  # Approximate
+            'total_pages': math.ceil(self.count / self.page_size),
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import BaseUserManager
 from rest_framework.response import Response
 from rest_framework import status
+from core_db.hashing import HashingUnavailable
 
 
 def _set_profile_image(provider, user, response, update=True):
@@ -29,7 +30,10 @@ def _set_profile_image(provider, user, response, update=True):
         elif profile_img_url != user.profile_img:
             user.profile_img = profile_img_url
 
-        user.save()
+        if user.pk:
+            user.save(update_fields=["profile_img"])
+        else:
+            user.save()
         
     return user
 
@@ -105,6 +109,8 @@ def user_creation(backend, user, response, *args, **kwargs):
         # Set profile image if it exists
         return _set_profile_image(backend.name, new_user, response)
 
+    except HashingUnavailable as e:
+        return Response({"error": e.detail}, status=e.status_code, headers={"Retry-After": str(e.wait)})
     except Exception as e:
         print(e)
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
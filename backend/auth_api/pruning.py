@@ -0,0 +1,122 @@
+"""
+Pruning of expired refresh tokens.
+
+Expired outstanding tokens are deleted in bounded primary key chunks, each
+chunk with its blacklist entries in its own short transaction, so the
+deletion never holds locks on the whole table. A run is guarded by a cluster wide lock so
+only one process prunes at a time, and the scheduler of every process skips
+the run when another one pruned within the interval.
+"""
+import logging, threading, time, zlib
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils.timezone import now
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = "prune_tokens"
+# Released explicitly, the timeout only frees the lock of a crashed process
+LOCK_TIMEOUT = 60 * 60 # 1 hour
+# Set for the interval by the scheduled run, shared by every process through the cache
+LAST_RUN_KEY = "prune_tokens_last_run"
+
+
+@contextmanager
+def cluster_lock(name, timeout=LOCK_TIMEOUT):
+    """
+    Try to take a lock shared by every process, yields whether it was taken.
+    Uses a PostgreSQL advisory lock, or an atomic cache add on other databases.
+    """
+    if connection.vendor == "postgresql":
+        lock_id = zlib.crc32(name.encode())
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [lock_id])
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
+        return
+
+    key = f"lock_{name}"
+    acquired = cache.add(key, True, timeout=timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
+
+def prune_expired_tokens(batch_size=None, sleep=None, before=None):
+    """
+    Delete the outstanding tokens expired before `before` (now by default)
+    with their blacklist entries, `batch_size` rows per transaction and
+    `sleep` seconds between batches. Returns the number of deleted tokens.
+    """
+    batch_size = batch_size or settings.TOKEN_PRUNING_BATCH_SIZE
+    sleep = settings.TOKEN_PRUNING_SLEEP if sleep is None else sleep
+    before = before or now()
+
+    expired = OutstandingToken.objects.filter(expires_at__lt=before).order_by("pk")
+    deleted = 0
+    last_pk = 0
+    while True:
+        pks = list(expired.filter(pk__gt=last_pk).values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            break
+
+        # One transaction deleting the blacklist entries of the chunk then its
+        # tokens, only their ids are loaded for the cascade
+        _, counts = OutstandingToken.objects.filter(pk__in=pks).only("pk").delete()
+        deleted += counts.get(OutstandingToken._meta.label, 0)
+
+        last_pk = pks[-1]
+        if len(pks) < batch_size:
+            break
+        if sleep:
+            time.sleep(sleep)
+
+    return deleted
+
+def run_pruning(interval=None, **kwargs):
+    """
+    Prune under the cluster lock, returns the deleted count and elapsed seconds.
+    None when locked, or when a run started less than `interval` seconds ago.
+    """
+    with cluster_lock(LOCK_NAME) as acquired:
+        if not acquired:
+            return None
+        if interval and not cache.add(LAST_RUN_KEY, now().timestamp(), timeout=interval):
+            return None
+
+        start = time.perf_counter()
+        deleted = prune_expired_tokens(**kwargs)
+        return deleted, time.perf_counter() - start
+
+def start_scheduler(interval=None):
+    """Start a daemon thread pruning the expired tokens every `interval` seconds."""
+    interval = interval or settings.TOKEN_PRUNING_INTERVAL
+
+    def prune_task():
+        """Thread function to prune the expired refresh tokens."""
+        while True:
+            try:
+                result = run_pruning(interval=interval)
+            except Exception:
+                logger.exception("Token pruning failed")
+            else:
+                if result is not None:
+                    logger.info("Deleted %d expired refresh tokens in %.2fs", *result)
+            finally:
+                connection.close()
+
+            time.sleep(interval)
+
+    thread = threading.Thread(target=prune_task, name="token-pruning", daemon=True)
+    thread.start()
+    return thread
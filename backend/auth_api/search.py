@@ -0,0 +1,33 @@
+"""
+User search by email or username.
+
+On PostgreSQL the contains matches use the trigram GIN indexes of the user
+model. Prefix matches are only ranked first, they aren't looked up on their
+own, then the results are ranked by trigram similarity. Values shorter than
+a trigram hold no trigram to look up and may scan the table. Other databases
+(e.g. SQLite in tests) run the same matches unindexed and rank prefix
+matches first.
+"""
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+
+
+def search_users(queryset, value):
+    """Filter the users whose email or username contains the value, best matches first."""
+    value = value.strip()
+    if not value:
+        return queryset
+
+    prefix = Q(email__istartswith=value) | Q(username__istartswith=value)
+    queryset = queryset.filter(Q(email__icontains=value) | Q(username__icontains=value)).annotate(
+        prefix_match=Case(When(prefix, then=Value(1)), default=Value(0), output_field=IntegerField())
+    )
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.order_by('-prefix_match', 'email', 'id')
+
+    from django.contrib.postgres.search import TrigramSimilarity
+    queryset = queryset.annotate(
+        similarity=Greatest(TrigramSimilarity('email', value), TrigramSimilarity('username', value))
+    )
+    return queryset.order_by('-prefix_match', '-similarity', 'email', 'id')
@@ -1,7 +1,14 @@
 import re
+from collections import defaultdict
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from drf_spectacular.utils import extend_schema_field
+from core_db.roles import resolve_role
+from .tokens import UserRefreshToken, set_user_claims
 
 
 def validate_password(password):
@@ -62,18 +69,64 @@ class PasswordResetSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(errors)
         
         instance.set_password(password)
-        instance.save()
+        instance.save(update_fields=["password"])
 
         return instance
 
-class UserListSerializer(serializers.ModelSerializer):
+class UserGroupsMixin(serializers.Serializer):
+    """
+    Group names and role of the user.
+    Both read `user.groups.all()`, prefetch the groups when serializing many users.
+    """
+    groups = serializers.SlugRelatedField(many=True, read_only=True, slug_field='name')
+    role = serializers.SerializerMethodField()
+
+    @extend_schema_field(serializers.CharField())
+    def get_role(self, obj):
+        return resolve_role(group.name for group in obj.groups.all())
+
+class UserListSerializer(UserGroupsMixin, serializers.ModelSerializer):
     """List User Serializer"""
 
     class Meta:
         model = get_user_model()
-        fields = ('id', 'email', 'username', 'is_active', 'is_staff')
+        fields = ('id', 'email', 'username', 'is_active', 'is_staff', 'role', 'groups')
         read_only_fields = ('id', 'email', 'username', 'is_active', 'is_staff')
         
+def user_group_names(user_ids):
+    """Group names of the given users with one query, keyed by user id."""
+    links = get_user_model().groups.through.objects.filter(user_id__in=user_ids)
+    groups = defaultdict(list)
+    for user_id, name in links.values_list('user_id', 'group__name'):
+        groups[user_id].append(name)
+    return groups
+
+class UserRowListSerializer(serializers.ListSerializer):
+    """Reads the groups of the whole page with one query."""
+
+    def to_representation(self, data):
+        rows = list(data)
+        groups = user_group_names([row['id'] for row in rows])
+        return [self.child.to_representation(row, groups[row['id']]) for row in rows]
+
+class UserRowSerializer(serializers.BaseSerializer):
+    """
+    Read only UserListSerializer for the `values(*UserRowSerializer.columns)` rows
+    of the users list, without model instances or fields to run per row.
+    """
+    columns = ('id', 'email', 'username', 'is_active', 'is_staff')
+
+    class Meta:
+        list_serializer_class = UserRowListSerializer
+
+    def to_representation(self, instance, groups=None):
+        if groups is None:
+            groups = user_group_names([instance['id']])[instance['id']]
+        row = {column: instance[column] for column in self.columns}
+        row['role'] = resolve_role(groups)
+        row['groups'] = groups
+        return row
+
 class UserActionSerializer(serializers.ModelSerializer):
     """Action User Serializer"""
 
@@ -82,7 +135,7 @@ class UserActionSerializer(serializers.ModelSerializer):
         fields = ('id',)
         read_only_fields = ('id',)
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(UserGroupsMixin, serializers.ModelSerializer):
     """User Serializer"""
     profile_img = serializers.SerializerMethodField()
     
@@ -91,7 +144,7 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('id', 'email', 'password', 'username', 'first_name', 
                   'last_name', 'phone_number', 'profile_img', 'slug', 
                   'is_active', 'is_staff', 'is_superuser', 'is_email_verified',
-                  'is_phone_verified')
+                  'is_phone_verified', 'role', 'groups')
         read_only_fields = ('id', 'is_superuser', 'is_email_verified', 
                             'is_phone_verified')
         extra_kwargs = {
@@ -156,14 +209,21 @@ class UserSerializer(serializers.ModelSerializer):
             default_image_path = 'profile_images/default_profile.jpg'
             validated_data['profile_img'] = default_image_path
 
-        return get_user_model().objects.create_user(**validated_data)
+        try:
+            return get_user_model().objects.create_user(**validated_data)
+        except DjangoValidationError as e:
+            # Checks of User.save() the fields don't run, e.g. a slug taken by another user
+            raise serializers.ValidationError(serializers.as_serializer_error(e))
     
     def update(self, instance, validated_data):
         """Update and return an existing user"""
         if validated_data.get('phone_number') != instance.phone_number:
             validated_data['is_phone_verified'] = False
                 
-        return super().update(instance, validated_data)
+        try:
+            return super().update(instance, validated_data)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(serializers.as_serializer_error(e))
         
     
 class UserImageSerializer(serializers.ModelSerializer):
@@ -241,3 +301,42 @@ class UpdateUserSerializer(serializers.Serializer):
 class SocialOAuthSerializer(serializers.Serializer):
     token = serializers.CharField(required=True)
     provider = serializers.CharField(required=True)
+    
+class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair serializer embedding the user claims in the tokens"""
+    token_class = UserRefreshToken
+    
+class UserTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh serializer refreshing the user claims in the tokens"""
+    token_class = UserRefreshToken
+    
+    def validate(self, attrs):
+        """Validate the refresh token and issue tokens with the current user claims"""
+        refresh = self.token_class(attrs["refresh"])
+        
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM, None)
+        if user_id:
+            user = get_user_model().objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            
+            if not api_settings.USER_AUTHENTICATION_RULE(user):
+                raise AuthenticationFailed(
+                    self.error_messages["no_active_account"],
+                    "no_active_account",
+                )
+                
+            # Claims may have changed since the refresh token was issued
+            set_user_claims(refresh, user)
+            
+        data = {"access": str(refresh.access_token)}
+        
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+                
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            
+            data["refresh"] = str(refresh)
+            
+        return data
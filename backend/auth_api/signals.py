@@ -0,0 +1,12 @@
+"""Signals keeping the blacklist filter in sync"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .blacklist import blacklist_filter
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_blacklisted_token_to_filter(sender, instance, created, **kwargs):
+    """Add tokens blacklisted outside of the token classes, e.g. from the admin, to the filter"""
+    if created:
+        blacklist_filter.add(instance.token.jti)
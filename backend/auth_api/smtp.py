@@ -0,0 +1,185 @@
+"""
+Pooled SMTP mail backend.
+
+Opening an SMTP connection costs a TLS handshake and a login. The pooled
+backend keeps authenticated connections open between sends and shares them
+between threads, one pool per server and account. Connections are closed
+after an error, after `EMAIL_POOL_MAX_MESSAGES` mails or once idle for
+`EMAIL_POOL_MAX_IDLE` seconds, servers drop idle sessions.
+"""
+import smtplib, threading, time
+from collections import deque
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.smtp import EmailBackend
+
+
+class SMTPConnectionPool:
+    """Authenticated SMTP connections reused between sends, with send metrics."""
+
+    def __init__(self, connection_params, size=None, max_idle=None, max_messages=None):
+        self.connection_params = connection_params
+        self.size = size or settings.EMAIL_POOL_SIZE
+        self.max_idle = settings.EMAIL_POOL_MAX_IDLE if max_idle is None else max_idle
+        self.max_messages = max_messages or settings.EMAIL_POOL_MAX_MESSAGES
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self.opened = self.reused = self.recycled = 0
+        self.sent = self.failed = 0
+        self.send_time = self.max_send_time = 0.0
+
+    def _open(self):
+        """Open and log in a new connection."""
+        connection = EmailBackend(fail_silently=False, **self.connection_params)
+        connection.open()
+        connection.messages_sent = 0
+        with self._lock:
+            self.opened += 1
+        return connection
+
+    def acquire(self):
+        """Return an open connection, waiting while all of them are in use."""
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    return self._open()
+                if time.monotonic() - connection.last_used < self.max_idle:
+                    with self._lock:
+                        self.reused += 1
+                    return connection
+                self._close(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, broken=False):
+        """Give the connection back, closed when it failed or sent its share of mails."""
+        try:
+            if broken or connection.messages_sent >= self.max_messages:
+                self._close(connection)
+            else:
+                connection.last_used = time.monotonic()
+                with self._lock:
+                    self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    def _close(self, connection):
+        with self._lock:
+            self.recycled += 1
+        try:
+            connection.close()
+        except (OSError, smtplib.SMTPException):
+            pass
+
+    def record(self, sent, failed, elapsed):
+        """Record the outcome and duration of a send."""
+        with self._lock:
+            self.sent += sent
+            self.failed += failed
+            self.send_time += elapsed
+            self.max_send_time = max(self.max_send_time, elapsed)
+
+    def close_all(self):
+        """Close the idle connections."""
+        with self._lock:
+            connections, self._idle = list(self._idle), deque()
+        for connection in connections:
+            self._close(connection)
+
+    def stats(self):
+        """Pool size and send latency metrics."""
+        with self._lock:
+            sends = self.sent + self.failed
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "opened": self.opened,
+                "reused": self.reused,
+                "recycled": self.recycled,
+                "sent": self.sent,
+                "failed": self.failed,
+                "average_send_time": self.send_time / sends if sends else 0.0,
+                "max_send_time": self.max_send_time,
+            }
+
+class PooledSMTPBackend(BaseEmailBackend):
+    """SMTP backend sending through the pooled connections of its server and account."""
+    pools = {}
+    pools_lock = threading.Lock()
+
+    def __init__(self, host=None, port=None, username=None, password=None, use_tls=None,
+                 fail_silently=False, use_ssl=None, timeout=None, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        self.connection_params = {
+            "host": host or settings.EMAIL_HOST,
+            "port": port or settings.EMAIL_PORT,
+            "username": settings.EMAIL_HOST_USER if username is None else username,
+            "password": settings.EMAIL_HOST_PASSWORD if password is None else password,
+            "use_tls": settings.EMAIL_USE_TLS if use_tls is None else use_tls,
+            "use_ssl": settings.EMAIL_USE_SSL if use_ssl is None else use_ssl,
+            "timeout": settings.EMAIL_TIMEOUT if timeout is None else timeout,
+        }
+
+    @property
+    def pool(self):
+        params = self.connection_params
+        key = (params["host"], params["port"], params["username"], params["use_tls"], params["use_ssl"])
+        with self.pools_lock:
+            if key not in self.pools:
+                self.pools[key] = SMTPConnectionPool(params)
+            return self.pools[key]
+
+    def send_messages(self, email_messages):
+        """
+        Send the messages one by one over pooled connections, returns the number sent.
+        A message is only retried when its own send failed, the ones accepted before aren't sent again.
+        """
+        if not email_messages:
+            return 0
+
+        pool = self.pool
+        start = time.perf_counter()
+        sent = 0
+        connection = None
+        try:
+            for message in email_messages:
+                # A pooled connection may have been dropped by the server, retry once on a new one
+                for attempt in range(2):
+                    if connection is None:
+                        connection = pool.acquire()
+                    try:
+                        sent += connection.send_messages([message])
+                        break
+                    except smtplib.SMTPServerDisconnected:
+                        pool.release(connection, broken=True)
+                        connection = None
+                        if attempt:
+                            raise
+
+                connection.messages_sent += 1
+                if connection.messages_sent >= pool.max_messages:
+                    pool.release(connection)
+                    connection = None
+        except (OSError, smtplib.SMTPException):
+            if connection is not None:
+                pool.release(connection, broken=True)
+            pool.record(sent, len(email_messages) - sent, time.perf_counter() - start)
+            if not self.fail_silently:
+                raise
+            return sent
+
+        if connection is not None:
+            pool.release(connection)
+        pool.record(sent, len(email_messages) - sent, time.perf_counter() - start)
+        return sent
+
+    @classmethod
+    def pool_stats(cls):
+        """Metrics of every pool by host and user."""
+        with cls.pools_lock:
+            return {f"{key[2]}@{key[0]}:{key[1]}": pool.stats() for key, pool in cls.pools.items()}
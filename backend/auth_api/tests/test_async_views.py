@@ -0,0 +1,143 @@
+from unittest.mock import patch
+from asgiref.sync import async_to_sync
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.test import TransactionTestCase, AsyncClient, Client
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from auth_api.utils import LoginSession
+
+
+LOGIN_URL = reverse('async-login')
+DRF_LOGIN_URL = reverse('login')
+LOGOUT_URL = reverse('async-logout')
+TOKEN_URL = reverse('async-token')
+TOKEN_REFRESH_URL = reverse('async-token-refresh')
+
+def create_user(**params):
+    """Create and return a new user"""
+    return get_user_model().objects.create_user(**params)
+
+# The blocking parts run on other threads, which only see committed data
+class AsyncLoginFlowTests(TransactionTestCase):
+    """Test the ASGI native login, token, refresh and logout views"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = AsyncClient()
+        self.user = create_user(
+            email='test@example.com',
+            password='TestP@ssw0rd',
+            is_email_verified=True,
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    async def login(self):
+        """Login and return the tokens"""
+        await self.client.post(LOGIN_URL, {'email': 'test@example.com', 'password': 'TestP@ssw0rd'}, content_type='application/json')
+        session = await LoginSession.aget(self.user.id)
+        res = await self.client.post(TOKEN_URL, {'user_id': self.user.id, 'otp': session['otp']}, content_type='application/json')
+        return res.json()
+
+    async def test_login_sends_otp(self):
+        """Test valid credentials start a login session and send the OTP"""
+        res = await self.client.post(LOGIN_URL, {'email': 'test@example.com', 'password': 'TestP@ssw0rd'}, content_type='application/json')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {"success": "Email sent", "otp": True, "user_id": self.user.id})
+        session = await LoginSession.aget(self.user.id)
+        self.assertIn(str(session['otp']), mail.outbox[0].body)
+
+    async def test_login_invalid_credentials(self):
+        """Test a wrong password is counted and rejected"""
+        res = await self.client.post(LOGIN_URL, {'email': 'test@example.com', 'password': 'wrong'}, content_type='application/json')
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json(), {"errors": "Invalid credentials"})
+        await self.user.arefresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, 1)
+
+    async def test_login_throttled_while_otp_recent(self):
+        """Test another OTP can't be requested right after one was sent"""
+        data = {'email': 'test@example.com', 'password': 'TestP@ssw0rd'}
+        await self.client.post(LOGIN_URL, data, content_type='application/json')
+        res = await self.client.post(LOGIN_URL, data, content_type='application/json')
+
+        self.assertEqual(res.status_code, 429)
+
+    def test_login_matches_drf_view(self):
+        """Test the DRF and async login views answer and count failures the same way"""
+        passwords = ['wrong', 'TestP@ssw0rd', 'wrong', 'TestP@ssw0rd', 'wrong']
+        results = []
+        for url, post in ((DRF_LOGIN_URL, Client().post), (LOGIN_URL, async_to_sync(AsyncClient().post))):
+            cache.clear()
+            get_user_model().objects.filter(pk=self.user.pk).update(failed_login_attempts=0)
+            result = []
+            for password in passwords:
+                res = post(url, {'email': 'test@example.com', 'password': password}, content_type='application/json')
+                self.user.refresh_from_db()
+                result.append((res.status_code, self.user.failed_login_attempts))
+            results.append(result)
+
+        self.assertEqual(results[0], results[1])
+        # Wrong passwords are counted while the OTP throttle is exceeded
+        self.assertEqual(results[1], [(400, 1), (200, 0), (400, 1), (429, 1), (400, 2)])
+
+    async def test_token_issued_once(self):
+        """Test the OTP issues tokens once"""
+        await self.client.post(LOGIN_URL, {'email': 'test@example.com', 'password': 'TestP@ssw0rd'}, content_type='application/json')
+        session = await LoginSession.aget(self.user.id)
+        data = {'user_id': self.user.id, 'otp': session['otp']}
+
+        res1 = await self.client.post(TOKEN_URL, data, content_type='application/json')
+        res2 = await self.client.post(TOKEN_URL, data, content_type='application/json')
+
+        self.assertEqual(res1.status_code, 200)
+        self.assertEqual(res1.json()['user_role'], 'Default')
+        self.assertIn('refresh_token', res1.json())
+        self.assertEqual(res2.json(), {"errors": "Session expired. Please login again."})
+
+    async def test_token_session_replaced_by_resend(self):
+        """Test an OTP verified just before a resend can't use the new session"""
+        await self.client.post(LOGIN_URL, {'email': 'test@example.com', 'password': 'TestP@ssw0rd'}, content_type='application/json')
+        session = await LoginSession.aget(self.user.id)
+
+        async def get_then_resend(user_id):
+            await LoginSession.astart(user_id, session['otp'] + 1, 'test@example.com', 'TestP@ssw0rd')
+            return session
+
+        with patch('auth_api.async_views.LoginSession.aget', side_effect=get_then_resend):
+            res = await self.client.post(TOKEN_URL, {'user_id': self.user.id, 'otp': session['otp']}, content_type='application/json')
+
+        self.assertEqual(res.json(), {"errors": "Session expired. Please login again."})
+
+    async def test_token_invalid_otp(self):
+        """Test a wrong OTP is rejected"""
+        await self.client.post(LOGIN_URL, {'email': 'test@example.com', 'password': 'TestP@ssw0rd'}, content_type='application/json')
+
+        res = await self.client.post(TOKEN_URL, {'user_id': self.user.id, 'otp': '000000'}, content_type='application/json')
+
+        self.assertEqual(res.json(), {"errors": "Invalid OTP"})
+
+    async def test_refresh_rotates_token(self):
+        """Test refreshing rotates the refresh token"""
+        tokens = await self.login()
+
+        res = await self.client.post(TOKEN_REFRESH_URL, {'refresh': tokens['refresh_token']}, content_type='application/json')
+        reused = await self.client.post(TOKEN_REFRESH_URL, {'refresh': tokens['refresh_token']}, content_type='application/json')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.json()['refresh_token'], tokens['refresh_token'])
+        self.assertEqual(reused.status_code, 401)
+
+    async def test_logout_blacklists_token(self):
+        """Test logout blacklists the refresh token"""
+        tokens = await self.login()
+
+        res = await self.client.post(LOGOUT_URL, {'refresh': tokens['refresh_token']}, content_type='application/json')
+
+        self.assertEqual(res.json(), {"success": "Logged out successfully"})
+        self.assertEqual(await BlacklistedToken.objects.acount(), 1)
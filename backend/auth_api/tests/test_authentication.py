@@ -0,0 +1,88 @@
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from auth_api.tokens import UserRefreshToken
+
+
+TOKEN_REFRESH_URL = reverse('token-refresh')
+
+def detail_url(user_id):
+    """Create and return a user detail URL"""
+    return reverse('user-detail', args=[user_id])
+
+def create_user(**params):
+    """Create and return a new user"""
+    return get_user_model().objects.create_user(**params)
+
+class StatelessAuthenticationTests(APITestCase):
+    """Test the token claims based authentication"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(
+            email='test@example.com',
+            password='Django@123',
+            is_email_verified=True,
+        )
+        self.client = APIClient()
+        self.url = detail_url(self.user.id)
+
+    def tearDown(self):
+        cache.clear()
+
+    def authenticate(self, refresh):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    def test_tokens_carry_user_claims(self):
+        """Test the claims are embedded in both tokens"""
+        refresh = UserRefreshToken.for_user(self.user)
+        access = refresh.access_token
+
+        for token in (refresh, access):
+            self.assertTrue(token['is_active'])
+            self.assertFalse(token['is_staff'])
+            self.assertFalse(token['is_superuser'])
+            self.assertEqual(token['role'], 'Default')
+
+    def test_retrieve_skips_user_lookup(self):
+        """Test retrieve only queries the requested user and its groups"""
+        self.authenticate(UserRefreshToken.for_user(self.user))
+
+        with self.assertNumQueries(2):
+            res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_retrieve_falls_back_for_tokens_without_claims(self):
+        """Test tokens issued without the claims load the user row"""
+        self.authenticate(RefreshToken.for_user(self.user))
+
+        with self.assertNumQueries(3):
+            res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_rejects_inactive_claim(self):
+        """Test a token issued for an inactive user is rejected"""
+        refresh = UserRefreshToken.for_user(self.user)
+        refresh['is_active'] = False
+        self.authenticate(refresh)
+
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_updates_claims(self):
+        """Test refreshed tokens carry the current claims of the user"""
+        refresh = UserRefreshToken.for_user(self.user)
+        self.user.is_staff = True
+        self.user.save()
+
+        res = self.client.post(TOKEN_REFRESH_URL, {'refresh': str(refresh)}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(RefreshToken(res.data['refresh_token'])['is_staff'])
@@ -0,0 +1,157 @@
+import threading, uuid
+from unittest.mock import patch
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from auth_api.blacklist import BloomFilter, BlacklistFilter, blacklist_filter
+from auth_api.tokens import UserRefreshToken
+
+
+LOGOUT_URL = reverse('logout')
+TOKEN_REFRESH_URL = reverse('token-refresh')
+
+class BloomFilterTests(SimpleTestCase):
+    """Test the bloom filter"""
+
+    def test_no_false_negatives(self):
+        """Test every added item is reported as present"""
+        bloom = BloomFilter(1024, 0.01)
+        items = [str(uuid.uuid4()) for _ in range(bloom.capacity)]
+        for item in items:
+            bloom.add(item)
+
+        self.assertTrue(all(item in bloom for item in items))
+
+    def test_false_positive_rate_within_target(self):
+        """Test the false positive rate at capacity stays near the target"""
+        bloom = BloomFilter(1024, 0.01)
+        for _ in range(bloom.capacity):
+            bloom.add(str(uuid.uuid4()))
+
+        false_positives = sum(str(uuid.uuid4()) in bloom for _ in range(10000))
+
+        self.assertLess(false_positives / 10000, 0.03)
+        self.assertAlmostEqual(bloom.expected_false_positive_rate, 0.01, delta=0.005)
+
+class BlacklistFilterTests(TestCase):
+    """Test the blacklist filter sync"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='test@example.com', password='Django@123')
+
+    def blacklist_elsewhere(self, jti):
+        """Blacklist a token without signals, as another process would"""
+        token = OutstandingToken.objects.create(user=self.user, jti=jti, token="token", expires_at="2100-01-01T00:00Z")
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token)])
+
+    def test_sync_adds_tokens_blacklisted_elsewhere(self):
+        """Test tokens blacklisted by another process are seen after the staleness window"""
+        blacklist = BlacklistFilter(max_staleness=60)
+        self.assertFalse(blacklist.might_contain("first"))
+
+        self.blacklist_elsewhere("first")
+        self.assertFalse(blacklist.might_contain("first"))
+
+        blacklist.sync(force=True)
+        self.assertTrue(blacklist.might_contain("first"))
+
+    def test_sync_is_incremental(self):
+        """Test a sync only reads the rows added since the previous one"""
+        blacklist = BlacklistFilter(max_staleness=0)
+        self.blacklist_elsewhere("first")
+        blacklist.sync()
+        self.blacklist_elsewhere("second")
+
+        with self.assertNumQueries(1):
+            blacklist.sync()
+
+        self.assertEqual(blacklist.stats()["entries"], 2)
+
+    def test_readers_see_full_filter_during_rebuild(self):
+        """Test a rebuild doesn't expose an empty filter to readers in other threads"""
+        blacklist = BlacklistFilter(memory=16, max_staleness=60)
+        for index in range(20):
+            self.blacklist_elsewhere(f"jti-{index}")
+        blacklist.sync(force=True)
+        self.assertGreater(blacklist.stats()["entries"], blacklist.stats()["capacity"])
+        # Most tokens are pruned, the rebuild keeps the others
+        BlacklistedToken.objects.exclude(token__jti__in=["jti-0", "jti-1", "jti-2"]).delete()
+        jtis = ["jti-0", "jti-1", "jti-2"]
+
+        seen = []
+        add = BloomFilter.add
+
+        def read_then_add(bloom, item):
+            reader = threading.Thread(target=lambda: seen.append(all(blacklist.might_contain(jti) for jti in jtis)))
+            reader.start()
+            reader.join()
+            return add(bloom, item)
+
+        with patch.object(BloomFilter, 'add', read_then_add):
+            blacklist.sync(force=True)
+
+        self.assertEqual(len(seen), len(jtis))
+        self.assertTrue(all(seen))
+
+    def test_live_tokens_over_capacity_resize_filter(self):
+        """Test live tokens beyond the capacity grow the filter instead of rebuilding it on every sync"""
+        blacklist = BlacklistFilter(memory=16, max_staleness=0)
+        for index in range(20):
+            self.blacklist_elsewhere(f"jti-{index}")
+        blacklist.sync()
+
+        with self.assertLogs('auth_api.blacklist', 'WARNING') as logs:
+            blacklist.sync()
+        self.assertIn("20 blacklisted tokens", logs.output[0])
+        self.assertGreaterEqual(blacklist.stats()["capacity"], 40)
+        self.assertEqual(blacklist.stats()["entries"], 20)
+
+        with self.assertNumQueries(1):
+            blacklist.sync()
+        self.assertTrue(blacklist.might_contain("jti-19"))
+
+class RefreshBlacklistTests(APITestCase):
+    """Test the refresh token blacklist checks through the filter"""
+
+    def setUp(self):
+        blacklist_filter.reset()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='Django@123',
+            is_email_verified=True,
+        )
+
+    def test_refresh_skips_database_check(self):
+        """Test refreshing a token that isn't blacklisted doesn't look up the blacklist"""
+        refresh = UserRefreshToken.for_user(self.user)
+
+        res = self.client.post(TOKEN_REFRESH_URL, {"refresh": str(refresh)}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        stats = blacklist_filter.stats()
+        self.assertEqual(stats["checks"], 1)
+        self.assertEqual(stats["database_checks"], 0)
+
+    def test_rotated_token_rejected(self):
+        """Test a refresh token can't be used again after rotation"""
+        refresh = str(UserRefreshToken.for_user(self.user))
+        self.client.post(TOKEN_REFRESH_URL, {"refresh": refresh}, format="json")
+
+        res = self.client.post(TOKEN_REFRESH_URL, {"refresh": refresh}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(blacklist_filter.stats()["hits"], 1)
+
+    def test_logged_out_token_rejected(self):
+        """Test a refresh token can't be used after logout"""
+        refresh = str(UserRefreshToken.for_user(self.user))
+        self.client.post(LOGOUT_URL, {"refresh": refresh}, format="json")
+
+        res = self.client.post(TOKEN_REFRESH_URL, {"refresh": refresh}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(blacklist_filter.stats()["hits"], 1)
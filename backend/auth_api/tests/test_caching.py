@@ -0,0 +1,38 @@
+from unittest.mock import Mock, patch
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase, override_settings
+from auth_api.caching import pop
+
+
+class CachingTests(SimpleTestCase):
+    """Test the atomic cache helpers"""
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_pop_returns_value_once(self):
+        """Test a popped key is returned once then gone"""
+        cache.set("login_session_1", {"otp": 123456})
+
+        self.assertEqual(pop("login_session_1"), {"otp": 123456})
+        self.assertIsNone(pop("login_session_1"))
+        self.assertIsNone(cache.get("login_session_1"))
+
+    @override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://localhost:6379"}
+    })
+    def test_pop_uses_getdel_on_redis(self):
+        """Test a key is popped with a single GETDEL on Redis"""
+        backend = caches["default"]
+        client = Mock()
+        client.getdel.side_effect = [backend._cache._serializer.dumps({"otp": 123456}), None]
+
+        with patch.object(backend._cache, "get_client", return_value=client):
+            self.assertEqual(pop("login_session_1"), {"otp": 123456})
+            self.assertIsNone(pop("login_session_1"))
+
+        client.getdel.assert_called_with(backend.make_and_validate_key("login_session_1"))
+        self.assertEqual(client.getdel.call_count, 2)
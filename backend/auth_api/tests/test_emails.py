@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core import mail
+from django.test import SimpleTestCase
+from auth_api.emails import CompiledTemplate, EMAIL_TEMPLATES
+from auth_api.utils import EmailOtp
+
+
+class EmailTemplateTests(SimpleTestCase):
+    """Test the precompiled email templates"""
+
+    def test_static_values_rendered_at_compile_time(self):
+        """Test only the per mail values are left as slots"""
+        template = CompiledTemplate("Hi {{ email }}, Welcome to {{ app_name }}", {"app_name": "App"})
+
+        self.assertEqual(template.variables, {"email"})
+        self.assertIn(", Welcome to App", template.parts)
+        self.assertEqual(template.render(email="test@example.com"), "Hi test@example.com, Welcome to App")
+
+    def test_html_values_escaped(self):
+        """Test the values are escaped in the HTML part only"""
+        message = EMAIL_TEMPLATES["login_otp"].render("test@example.com", email="<b>test</b>", otp=123456)
+
+        html, mimetype = message.alternatives[0]
+        self.assertEqual(mimetype, "text/html")
+        self.assertIn("&lt;b&gt;test&lt;/b&gt;", html)
+        self.assertIn("Hi <b>test</b>,", message.body)
+
+    def test_otp_mail_multipart(self):
+        """Test the OTP mail is sent with text and HTML bodies"""
+        self.assertTrue(EmailOtp.send_email_otp("test@example.com", 123456))
+
+        message = mail.outbox[0]
+        self.assertEqual(message.subject, "2 Factor Login Authentication")
+        self.assertEqual(
+            message.body,
+            f"Hi test@example.com, Welcome to {settings.APP_NAME}\n\nYour OTP code is: 123456\n\nThe OTP will expire in 10 minutes"
+        )
+        self.assertIn("123456", message.alternatives[0][0])
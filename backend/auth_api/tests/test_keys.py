@@ -0,0 +1,101 @@
+import jwt
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.exceptions import TokenBackendError
+from backend.keys import KeyRing, generate_private_key, key_algorithm
+from auth_api.backends import KeyRingTokenBackend
+from auth_api.tokens import UserRefreshToken
+
+
+JWKS_URL = reverse('jwks')
+
+def create_keyring(*previous_keys, algorithm="RS256"):
+    """Create a key ring with a fresh signing key and the given retired keys"""
+    private_key = generate_private_key(algorithm)
+    keyring = KeyRing(private_key, private_key.public_key(), algorithm)
+    for key in previous_keys:
+        keyring.add_verifying_key(key.public_key())
+
+    return private_key, keyring
+
+class KeyRingTests(APITestCase):
+    """Test signing key rotation and the JWKS endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.payload = {"user_id": 1, "token_type": "access"}
+
+    def test_issued_tokens_carry_kid(self):
+        """Test tokens are signed with the active key and carry its kid"""
+        user = get_user_model().objects.create_user(email='test@example.com', password='Django@123')
+        token = str(UserRefreshToken.for_user(user).access_token)
+
+        self.assertEqual(jwt.get_unverified_header(token)["kid"], settings.JWT_KEYRING.signing_kid)
+
+    def test_jwks_verifies_issued_tokens(self):
+        """Test the published keys verify the issued tokens"""
+        user = get_user_model().objects.create_user(email='test@example.com', password='Django@123')
+        token = str(UserRefreshToken.for_user(user).access_token)
+
+        res = self.client.get(JWKS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        keys = {key["kid"]: key for key in res.data["keys"]}
+        jwk = jwt.PyJWK(keys[jwt.get_unverified_header(token)["kid"]])
+        payload = jwt.decode(token, jwk.key, algorithms=[jwk.algorithm_name])
+        self.assertEqual(payload["user_id"], user.id)
+
+    def test_retired_key_still_verifies(self):
+        """Test tokens signed by a retired key are verified after rotation"""
+        old_key, old_keyring = create_keyring()
+        token = KeyRingTokenBackend(old_keyring).encode(self.payload)
+
+        _, keyring = create_keyring(old_key)
+        backend = KeyRingTokenBackend(keyring)
+
+        self.assertEqual(backend.decode(token)["user_id"], 1)
+        self.assertEqual(len(keyring.jwks()["keys"]), 2)
+
+    def test_unknown_kid_rejected(self):
+        """Test tokens signed by a key outside the ring are rejected"""
+        _, other_keyring = create_keyring()
+        token = KeyRingTokenBackend(other_keyring).encode(self.payload)
+
+        _, keyring = create_keyring()
+
+        with self.assertRaises(TokenBackendError):
+            KeyRingTokenBackend(keyring).decode(token)
+
+    def test_key_algorithm_inferred_from_key_type(self):
+        """Test the default algorithm of each key type"""
+        for algorithm in ("RS256", "ES256", "EdDSA"):
+            private_key = generate_private_key(algorithm)
+            self.assertEqual(key_algorithm(private_key), algorithm)
+            self.assertEqual(key_algorithm(private_key.public_key()), algorithm)
+
+    def test_algorithm_migration_window(self):
+        """Test RS256 tokens still verify after switching the signing key to EdDSA"""
+        old_key, old_keyring = create_keyring()
+        old_token = KeyRingTokenBackend(old_keyring).encode(self.payload)
+        legacy_token = jwt.encode(self.payload, old_key, algorithm="RS256")
+
+        _, keyring = create_keyring(old_key, algorithm="EdDSA")
+        backend = KeyRingTokenBackend(keyring)
+        new_token = backend.encode(self.payload)
+
+        self.assertEqual(jwt.get_unverified_header(new_token)["alg"], "EdDSA")
+        for token in (old_token, legacy_token, new_token):
+            self.assertEqual(backend.decode(token)["user_id"], 1)
+
+        algorithms = sorted(key["alg"] for key in keyring.jwks()["keys"])
+        self.assertEqual(algorithms, ["EdDSA", "RS256"])
+
+    def test_signing_key_must_match_algorithm(self):
+        """Test a key ring can't sign with a key of another type"""
+        private_key = generate_private_key("ES256")
+
+        with self.assertRaises(ValueError):
+            KeyRing(private_key, private_key.public_key(), "RS256")
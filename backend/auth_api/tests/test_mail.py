@@ -0,0 +1,135 @@
+import os, shutil, stat, tempfile, threading
+from io import StringIO
+from unittest.mock import patch
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from auth_api.mail import MailQueue, FAILED, QUEUED, SENT, send_mail_message
+
+
+def create_message(**params):
+    """Create and return an email message"""
+    defaults = {'subject': 'Subject', 'body': 'Body', 'to': ['test@example.com']}
+    defaults.update(params)
+    return EmailMessage(**defaults)
+
+class MailQueueTests(SimpleTestCase):
+    """Test the spooled mail queue"""
+
+    def setUp(self):
+        cache.clear()
+        self.spool_dir = tempfile.mkdtemp()
+        self.queue = MailQueue(spool_dir=self.spool_dir, backoff=0, eager=True)
+
+    def tearDown(self):
+        self.queue.join()
+        shutil.rmtree(self.spool_dir)
+        cache.clear()
+
+    def spooled(self):
+        """Names of the spool files"""
+        return [name for _, _, names in os.walk(self.spool_dir) for name in names]
+
+    def test_enqueue_sends_mail(self):
+        """Test a queued mail is sent and removed from the spool"""
+        mail_id = self.queue.enqueue(create_message())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['test@example.com'])
+        self.assertEqual(self.queue.status(mail_id)['status'], SENT)
+        self.assertEqual(self.spooled(), [])
+
+    def test_enqueue_in_thread_pool(self):
+        """Test mails are sent by the thread pool outside of the caller"""
+        queue = MailQueue(spool_dir=self.spool_dir, eager=False)
+        mail_ids = [queue.enqueue(create_message()) for _ in range(3)]
+        queue.join()
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertTrue(all(queue.status(mail_id)['status'] == SENT for mail_id in mail_ids))
+
+    def test_mails_spooled_while_busy_sent_together(self):
+        """Test the mails queued while the workers are busy are sent over one connection"""
+        queue = MailQueue(spool_dir=self.spool_dir, workers=1, eager=False)
+        busy = threading.Event()
+        queue.executor.submit(busy.wait)
+        mail_ids = [queue.enqueue(create_message()) for _ in range(3)]
+
+        with patch.object(EmailBackend, 'open') as mock_open:
+            busy.set()
+            queue.join()
+
+        self.assertEqual(mock_open.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertTrue(all(queue.status(mail_id)['status'] == SENT for mail_id in mail_ids))
+
+    def test_failed_send_retried(self):
+        """Test a failed send is retried and the attempts are counted"""
+        with patch.object(EmailBackend, 'send_messages', side_effect=[OSError("Connection refused"), 1]):
+            mail_id = self.queue.enqueue(create_message())
+
+        status = self.queue.status(mail_id)
+        self.assertEqual(status['status'], SENT)
+        self.assertEqual(status['attempts'], 2)
+
+    def test_failed_after_max_attempts(self):
+        """Test a mail is given up after the maximum attempts"""
+        queue = MailQueue(spool_dir=self.spool_dir, max_attempts=3, backoff=0, eager=True)
+        with patch.object(EmailBackend, 'send_messages', side_effect=OSError("Connection refused")) as mock_send:
+            mail_id = queue.enqueue(create_message())
+
+        self.assertEqual(mock_send.call_count, 3)
+        self.assertEqual(queue.status(mail_id), {'status': FAILED, 'attempts': 3, 'error': "Connection refused"})
+        self.assertEqual(self.spooled(), [])
+
+    def test_spooled_mail_sent_by_command(self):
+        """Test mails left in the spool by a stopped process are sent by the command"""
+        with patch.object(MailQueue, '_schedule'):
+            mail_id = self.queue.enqueue(create_message(subject='Left behind'))
+
+        self.assertEqual(self.queue.status(mail_id)['status'], QUEUED)
+        self.assertEqual(len(mail.outbox), 0)
+
+        out = StringIO()
+        with patch('auth_api.management.commands.send_queued_mail.mail_queue', self.queue):
+            call_command('send_queued_mail', stdout=out)
+
+        self.assertIn("Processed 1 spooled mail(s)", out.getvalue())
+        self.assertEqual(mail.outbox[0].subject, 'Left behind')
+        self.assertEqual(self.spooled(), [])
+
+    def test_spool_only_readable_by_owner(self):
+        """Test the spooled mails and their directories are private and synced to disk"""
+        spool_dir = os.path.join(self.spool_dir, 'spool')
+        queue = MailQueue(spool_dir=spool_dir, eager=True)
+        with patch.object(MailQueue, '_schedule'), patch('auth_api.mail.os.fsync', wraps=os.fsync) as mock_fsync:
+            mail_id = queue.enqueue(create_message())
+
+        mode = lambda path: stat.S_IMODE(os.stat(path).st_mode)
+        self.assertEqual(mode(spool_dir), 0o700)
+        self.assertEqual(mode(queue.queue_dir), 0o700)
+        self.assertEqual(mode(os.path.join(queue.queue_dir, f'{mail_id}.json')), 0o600)
+        mock_fsync.assert_called_once()
+
+    def test_spool_error_logged(self):
+        """Test a mail that can't be spooled is logged and not sent"""
+        with patch('auth_api.mail.mail_queue.enqueue', side_effect=OSError("No space left on device")):
+            with self.assertLogs('auth_api.mail', 'ERROR') as logs:
+                self.assertIsNone(send_mail_message(create_message()))
+
+        self.assertIn("No space left on device", logs.output[0])
+
+    def test_spooled_mails_sent_in_batches(self):
+        """Test spooled mails are sent over one connection per batch"""
+        with patch.object(MailQueue, '_schedule'):
+            for _ in range(5):
+                self.queue.enqueue(create_message())
+
+        with self.settings(MAIL_BATCH_SIZE=2), patch.object(EmailBackend, 'open') as mock_open:
+            self.assertEqual(self.queue.recover(), 5)
+
+        self.assertEqual(mock_open.call_count, 3)
+        self.assertEqual(len(mail.outbox), 5)
@@ -0,0 +1,78 @@
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.timezone import now
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from auth_api.pruning import LOCK_NAME, cluster_lock, prune_expired_tokens, run_pruning
+
+
+def create_tokens(user, count, expires_at):
+    """Create outstanding tokens expiring at the given time"""
+    return OutstandingToken.objects.bulk_create(
+        OutstandingToken(user=user, jti=f"{expires_at.timestamp()}-{i}", token="token", expires_at=expires_at)
+        for i in range(count)
+    )
+
+class TokenPruningTests(TestCase):
+    """Test the expired refresh token pruning"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='test@example.com', password='Django@123')
+        self.expired = create_tokens(self.user, 5, now() - timedelta(hours=1))
+        self.active = create_tokens(self.user, 2, now() + timedelta(hours=1))
+        BlacklistedToken.objects.create(token=self.expired[0])
+        BlacklistedToken.objects.create(token=self.active[0])
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_prune_deletes_expired_tokens_in_batches(self):
+        """Test only expired tokens and their blacklist entries are deleted"""
+        deleted = prune_expired_tokens(batch_size=2, sleep=0)
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(
+            set(OutstandingToken.objects.values_list('pk', flat=True)),
+            {token.pk for token in self.active}
+        )
+        self.assertEqual(list(BlacklistedToken.objects.values_list('token_id', flat=True)), [self.active[0].pk])
+
+    def test_prune_batch_queries(self):
+        """Test each batch runs a bounded number of queries"""
+        # 3 batches of (ids select, select of the ids to delete, blacklist delete, token delete)
+        with self.assertNumQueries(3 * 4):
+            prune_expired_tokens(batch_size=2, sleep=0)
+
+    def test_scheduled_run_once_per_interval(self):
+        """Test the schedulers of other processes skip the run within the interval"""
+        first = run_pruning(interval=60, sleep=0)
+        create_tokens(self.user, 1, now() - timedelta(hours=1))
+        second = run_pruning(interval=60, sleep=0)
+
+        self.assertEqual(first[0], 5)
+        self.assertIsNone(second)
+        self.assertEqual(OutstandingToken.objects.count(), 3)
+        # The command isn't scheduled, it always runs
+        self.assertEqual(run_pruning(sleep=0)[0], 1)
+
+    def test_command_reports_rate(self):
+        """Test the command deletes expired tokens and reports the rate"""
+        out = StringIO()
+        call_command('prune_tokens', '--batch-size', '2', '--sleep', '0', stdout=out)
+
+        self.assertIn("Deleted 5 expired refresh tokens", out.getvalue())
+        self.assertIn("rows/s", out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+
+    def test_command_skipped_while_locked(self):
+        """Test the command does nothing while another process holds the lock"""
+        out = StringIO()
+        with cluster_lock(LOCK_NAME) as acquired:
+            self.assertTrue(acquired)
+            call_command('prune_tokens', stdout=out)
+
+        self.assertIn("skipped", out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 7)
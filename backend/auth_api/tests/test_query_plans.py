@@ -0,0 +1,83 @@
+import re
+from unittest import skipUnless
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import TestCase
+from auth_api.filters import UserFilter
+from auth_api.search import search_users
+
+
+POSTGRESQL = connection.vendor == 'postgresql'
+# A table read row by row instead of through an index
+SEQUENTIAL_SCAN = re.compile(r"Seq Scan on (core_db_user\w*)|SCAN (core_db_user\w*)(?! USING)")
+
+
+class QueryPlanTests(TestCase):
+    """Test the users lookups are answered from indexes, with EXPLAIN"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(5):
+            get_user_model().objects.create_user(
+                email=f"user{index}@example.com", password="Django@123", is_active=bool(index % 2)
+            )
+        Group.objects.get_or_create(name="Admin")
+
+    def plan(self, queryset):
+        """The plan of the queryset, PostgreSQL is told to avoid sequential scans of these small tables"""
+        if POSTGRESQL:
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    def users(self, **data):
+        """The users list queryset, as filtered for the users list endpoint"""
+        return UserFilter(data, queryset=get_user_model().objects.all()).qs[:2]
+
+    def assertNoSequentialScan(self, plan):
+        self.assertIsNone(SEQUENTIAL_SCAN.search(plan), plan)
+
+    def test_list_uses_email_index(self):
+        """Test the users list is read in email order from the index"""
+        plan = self.plan(self.users())
+
+        self.assertNoSequentialScan(plan)
+        self.assertNotIn("TEMP B-TREE FOR ORDER BY", plan)
+
+    def test_filter_by_active_uses_index(self):
+        """Test the users list filtered on is_active uses an index"""
+        plan = self.plan(self.users(is_active=False))
+
+        self.assertNoSequentialScan(plan)
+        if POSTGRESQL:
+            self.assertIn("core_db_user_active_email_idx", plan)
+
+    def test_filter_by_group_uses_index(self):
+        """Test the users of a group are found through the group links index"""
+        plan = self.plan(self.users(group="admin"))
+
+        self.assertNoSequentialScan(plan)
+
+    def test_login_lookup_uses_index(self):
+        """Test the login lookup by email uses the unique index"""
+        plan = self.plan(get_user_model().objects.filter(email="user1@example.com"))
+
+        self.assertNoSequentialScan(plan)
+
+    @skipUnless(POSTGRESQL, "The trigram indexes are PostgreSQL only")
+    def test_search_uses_trigram_index(self):
+        """Test the search by email or username uses the trigram indexes"""
+        plan = self.plan(self.users(search="user1"))
+
+        self.assertNoSequentialScan(plan)
+        self.assertIn("core_db_user_email_trgm", plan)
+        self.assertIn("core_db_user_username_trgm", plan)
+
+    @skipUnless(POSTGRESQL, "The trigram indexes are PostgreSQL only")
+    def test_ranked_search_uses_trigram_index(self):
+        """Test the matches ranked by prefix and similarity are still found through the trigram indexes"""
+        plan = self.plan(search_users(get_user_model().objects.all(), "ser1@example"))
+
+        self.assertNoSequentialScan(plan)
+        self.assertIn("core_db_user_email_trgm", plan)
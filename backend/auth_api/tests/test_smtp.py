@@ -0,0 +1,109 @@
+import smtplib
+from unittest.mock import patch
+from django.core.mail import EmailMessage
+from django.test import SimpleTestCase, override_settings
+from auth_api.smtp import PooledSMTPBackend
+
+
+class FakeSMTP:
+    """Local SMTP stand-in recording the connections and sent mails"""
+    connections = []
+
+    def __init__(self, host, port, **kwargs):
+        self.sent = []
+        self.logins = 0
+        self.closed = False
+        self.fail_next = None
+        self.drop_after = None
+        FakeSMTP.connections.append(self)
+
+    def starttls(self, context=None):
+        pass
+
+    def login(self, username, password):
+        self.logins += 1
+
+    def sendmail(self, from_email, recipients, message):
+        if self.fail_next:
+            error, self.fail_next = self.fail_next, None
+            raise error
+        if self.drop_after is not None and len(self.sent) >= self.drop_after:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.sent.append(recipients)
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+def create_messages(count):
+    """Create and return email messages"""
+    return [EmailMessage(subject='Subject', body='Body', to=[f'user{i}@example.com']) for i in range(count)]
+
+@override_settings(EMAIL_HOST_USER='sender@example.com', EMAIL_HOST_PASSWORD='password')
+@patch('django.core.mail.backends.smtp.smtplib.SMTP', FakeSMTP)
+class PooledSMTPBackendTests(SimpleTestCase):
+    """Test the pooled SMTP backend"""
+
+    def setUp(self):
+        FakeSMTP.connections = []
+        PooledSMTPBackend.pools = {}
+
+    def test_connection_reused(self):
+        """Test consecutive sends reuse one authenticated connection"""
+        for _ in range(3):
+            PooledSMTPBackend().send_messages(create_messages(2))
+
+        self.assertEqual(len(FakeSMTP.connections), 1)
+        self.assertEqual(FakeSMTP.connections[0].logins, 1)
+        self.assertEqual(len(FakeSMTP.connections[0].sent), 6)
+
+        stats = PooledSMTPBackend().pool.stats()
+        self.assertEqual((stats['opened'], stats['reused'], stats['sent']), (1, 2, 6))
+
+    def test_dropped_connection_recycled(self):
+        """Test a connection dropped by the server is replaced and the send retried"""
+        backend = PooledSMTPBackend()
+        backend.send_messages(create_messages(1))
+        FakeSMTP.connections[0].fail_next = smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+        self.assertEqual(backend.send_messages(create_messages(1)), 1)
+        self.assertEqual(len(FakeSMTP.connections), 2)
+        self.assertTrue(FakeSMTP.connections[0].closed)
+        self.assertEqual(backend.pool.stats()['recycled'], 1)
+
+    def test_connection_dropped_mid_batch(self):
+        """Test a drop mid-batch only resends the rest, the mails accepted before aren't sent twice"""
+        backend = PooledSMTPBackend()
+        backend.send_messages(create_messages(1))
+        FakeSMTP.connections[0].drop_after = 2
+
+        self.assertEqual(backend.send_messages(create_messages(3)), 3)
+
+        self.assertEqual(len(FakeSMTP.connections), 2)
+        self.assertEqual(FakeSMTP.connections[0].sent, [['user0@example.com'], ['user0@example.com']])
+        self.assertEqual(FakeSMTP.connections[1].sent, [['user1@example.com'], ['user2@example.com']])
+        self.assertEqual(backend.pool.stats()['sent'], 4)
+
+    def test_failed_send_raises(self):
+        """Test a rejected mail raises and its connection is not reused"""
+        backend = PooledSMTPBackend()
+        backend.send_messages(create_messages(1))
+        FakeSMTP.connections[0].fail_next = smtplib.SMTPRecipientsRefused({})
+
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            backend.send_messages(create_messages(1))
+
+        self.assertTrue(FakeSMTP.connections[0].closed)
+        self.assertEqual(backend.pool.stats()['failed'], 1)
+
+    @override_settings(EMAIL_POOL_MAX_MESSAGES=2)
+    def test_connection_renewed_after_max_messages(self):
+        """Test a connection is closed once it sent its share of mails"""
+        backend = PooledSMTPBackend()
+        backend.send_messages(create_messages(2))
+        backend.send_messages(create_messages(1))
+
+        self.assertEqual(len(FakeSMTP.connections), 2)
+        self.assertTrue(FakeSMTP.connections[0].closed)
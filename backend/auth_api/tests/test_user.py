@@ -1,4 +1,4 @@
-import os, io, json
+import os, io, csv, json
 from django.conf import settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
@@ -16,6 +16,15 @@ from rest_framework.test import APITestCase, APIClient
 from social_core.exceptions import AuthException
 from datetime import datetime, timedelta
 from unittest.mock import patch
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from auth_api.utils import LoginSession
+from auth_api.views import record_failed_login
+from auth_api.pipeline import user_creation
+from auth_api.serializers import UserListSerializer
+from core_db.hashing import HashingUnavailable
 
 
 CSRF_TOKEN_URL = reverse('csrf-token')
@@ -28,6 +37,7 @@ VERIFY_EMAIL_URL = reverse('email-verify')
 VERIFY_PHONE_URL = reverse('phone-verify')
 RESET_PASSWORD_URL = reverse('password-reset')
 USER_URL = reverse('user-list')
+USER_EXPORT_URL = reverse('user-export')
 SOCIAL_LOGIN_URL = reverse('social-auth')
 LOGOUT_URL = reverse('logout')
 
@@ -54,6 +64,15 @@ def create_user(**params):
     """Create and return a new user"""
     return get_user_model().objects.create_user(**params)
 
+def count_user_writes(queries):
+    """Return the UPDATEs of the user table and the unique checks run by full_clean in the queries"""
+    sql = [query['sql'] for query in queries]
+    updates = sum(query.startswith('UPDATE "core_db_user"') for query in sql)
+    unique_checks = sum(
+        query.startswith('SELECT 1 AS "a" FROM "core_db_user"') and 'NOT ("core_db_user"."id" =' in query for query in sql
+    )
+    return updates, unique_checks
+
 class CSRFTokenViewTests(APITestCase):
     """Test the CSRFTokenView"""
     
@@ -303,6 +322,29 @@ class LoginViewTests(APITestCase):
             self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
             self.assertEqual(self.test_user.failed_login_attempts, i)
 
+    def test_login_failed_attempts_restart_after_window(self):
+        """
+        Test the failed login count restarts when the last failure is older than 10 minutes.
+        """
+        self.test_user.failed_login_attempts = 3
+        self.test_user.last_failed_login_time = now() - timedelta(minutes=11)
+        self.test_user.save()
+
+        self.client.post(self.url, {'email': self.test_user.email, 'password': 'wrongpassword'}, format='json')
+
+        self.test_user.refresh_from_db()
+        self.assertEqual(self.test_user.failed_login_attempts, 1)
+
+    def test_record_failed_login_single_update(self):
+        """
+        Test a failed login is counted with one UPDATE, without the model validation and signals.
+        """
+        with self.assertNumQueries(4):  # Savepoint, UPDATE, SELECT of the count, release
+            message = record_failed_login(self.test_user)
+
+        self.assertEqual(message, "Invalid credentials")
+        self.assertEqual(self.test_user.failed_login_attempts, 1)
+
     def test_login_account_lockout_for_user(self):
         """
         Test that after reaching max failed login attempts, normal users are deactivated.
@@ -439,6 +481,38 @@ class LoginViewTests(APITestCase):
         self.assertIn('error', response.data)
         self.assertIn("Simulated Internal Server Error", response.data['error'])
 
+    @patch('auth_api.views.create_otp')
+    def test_login_upgrades_password_hash(self, mock_create_otp):
+        """
+        Test a successful login rehashes the password with the preferred hasher.
+        """
+        mock_create_otp.return_value = Response({"success": "Email sent", "otp": True}, status=status.HTTP_200_OK)
+        with self.settings(PASSWORD_HASHERS=['core_db.hashers.TunedPBKDF2PasswordHasher']):
+            self.test_user.set_password('TestP@ssw0rd')
+            self.test_user.save()
+
+        data = {'email': 'test@example.com', 'password': 'TestP@ssw0rd'}
+        with self.settings(PASSWORD_HASHERS=['core_db.hashers.TunedArgon2PasswordHasher', 'core_db.hashers.TunedPBKDF2PasswordHasher']):
+            response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.test_user.refresh_from_db()
+        self.assertTrue(self.test_user.password.startswith('argon2$'))
+
+    @patch('core_db.models.hashing_service.verify_password')
+    def test_login_hashing_unavailable(self, mock_verify_password):
+        """
+        Test the login is refused with a 503 while the hashing pool is saturated.
+        """
+        mock_verify_password.side_effect = HashingUnavailable()
+
+        data = {'email': 'test@example.com', 'password': 'TestP@ssw0rd'}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(response.data['error'], "Server is busy, try again later.")
+
     @patch('auth_api.views.check_user_validity')
     def test_login_throttled(self, mock_check_user_validity):
         """
@@ -449,8 +523,8 @@ class LoginViewTests(APITestCase):
         mock_check_user_validity.return_value = self.test_user
         data = {'email': 'test@example.com', 'password': 'TestP@ssw0rd'}
 
-        # ** Crucial: Seed the cache for the throttle to work
-        cache.set(f"id_{self.test_user.id}", self.test_user.id, timeout=60)
+        # ** Crucial: Seed the login session for the throttle to work
+        LoginSession.start(self.test_user.id, 123456, 'test@example.com', 'TestP@ssw0rd')
 
         # Make the first request (should succeed)
         response1 = self.client.post(self.url, data, format='json')
@@ -477,9 +551,7 @@ class ResendOtpViewTests(APITestCase):
         self.user_id = self.test_user.id
 
         # Cache user data to simulate a valid session
-        cache.set(f"id_{self.user_id}", self.user_id, timeout=60)
-        cache.set(f"email_{self.user_id}", 'test@example.com', timeout=600)
-        cache.set(f"password_{self.user_id}", 'TestP@ssw0rd', timeout=600)
+        LoginSession.start(self.user_id, 123456, 'test@example.com', 'TestP@ssw0rd')
 
         self.client.force_login(self.test_user) # Log in the client for consistent testing
 
@@ -597,8 +669,8 @@ class ResendOtpViewTests(APITestCase):
 
         data = {'user_id': self.user_id}
 
-        # ** Crucial: Seed the cache for the throttle to work
-        cache.set(f"id_{self.test_user.id}", self.test_user.id, timeout=60)
+        # ** Crucial: Seed the login session for the throttle to work
+        LoginSession.start(self.test_user.id, 123456, 'test@example.com', 'TestP@ssw0rd')
 
         # Make the first request (should succeed)
         response1 = self.client.post(self.url, data, format='json')
@@ -616,9 +688,8 @@ class ResendOtpViewTests(APITestCase):
         """
         mock_check_user_id.return_value = self.test_user
 
-        # Clear only email and password, leave id to pass check_throttles
-        cache.delete(f"email_{self.user_id}")
-        cache.delete(f"password_{self.user_id}")
+        # Expire the login session
+        cache.delete(LoginSession.key(self.user_id))
 
         data = {'user_id': self.user_id}
         response = self.client.post(self.url, data, format='json')
@@ -644,11 +715,7 @@ class TokenViewTests(APITestCase):
 
         # Cache user data to simulate a valid session and OTP
         self.otp = generate_otp() # Generate an OTP
-        cache.set(f"id_{self.user_id}", self.user_id, timeout=60)
-        cache.set(f"otp_{self.user_id}", self.otp, timeout=600)
-        cache.set(f"email_{self.user_id}", 'test@example.com', timeout=600)
-        cache.set(f"password_{self.user_id}", 'TestP@ssw0rd', timeout=600)
-        cache.set(f"otp_{self.user_id}", self.otp, timeout=600) # Cache otp
+        LoginSession.start(self.user_id, self.otp, 'test@example.com', 'TestP@ssw0rd')
 
         self.client.force_login(self.test_user)
 
@@ -676,6 +743,45 @@ class TokenViewTests(APITestCase):
         self.assertIn('user_role', response.data)
         self.assertIn('user_id', response.data)
 
+    def test_token_generation_ends_session(self):
+        """
+        Test the login session can only be used once.
+        """
+        data = {'user_id': self.user_id, 'otp': f"{self.otp}"}
+
+        response1 = self.client.post(self.url, data, format='json')
+        response2 = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response1.status_code, status.HTTP_200_OK)
+        self.assertEqual(response2.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response2.data['error'], "Session expired. Please login again.")
+        self.assertIsNone(LoginSession.get(self.user_id))
+
+    def test_token_generation_session_replaced_by_resend(self):
+        """
+        Test an OTP verified just before a resend can't use the new session.
+        """
+        session = LoginSession.get(self.user_id)
+
+        def get_then_resend(user_id):
+            LoginSession.start(user_id, self.otp + 1, 'test@example.com', 'TestP@ssw0rd')
+            return session
+
+        with patch('auth_api.views.LoginSession.get', side_effect=get_then_resend):
+            response = self.client.post(self.url, {'user_id': self.user_id, 'otp': f"{self.otp}"}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Session expired. Please login again.")
+
+    def test_token_generation_invalid_otp_keeps_session(self):
+        """
+        Test a wrong OTP can be corrected within the same login session.
+        """
+        self.client.post(self.url, {'user_id': self.user_id, 'otp': '000000'}, format='json')
+        response = self.client.post(self.url, {'user_id': self.user_id, 'otp': f"{self.otp}"}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_token_generation_missing_user_id(self):
         """
         Test that missing user_id returns 400 Bad Request.
@@ -1001,6 +1107,19 @@ class EmailVerifyViewTests(APITestCase):
         self.assertTrue(self.user.is_active)
         self.assertTrue(self.user.is_email_verified)
 
+    @patch('auth_api.views.check_token_validity')
+    def test_email_verify_get_updates_only_verification(self, mock_check_token_validity):
+        """
+        Test verifying the email is one UPDATE, without the unique checks of full_clean.
+        """
+        mock_check_token_validity.return_value = self.valid_email
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'token': 'dummy', 'expiry': 1234567890})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(count_user_writes(queries), (1, 0))
+
     @patch('auth_api.views.check_token_validity')
     def test_email_verify_get_invalid_user(self, mock_check_token_validity):
         """
@@ -1296,6 +1415,18 @@ class PrivatePhoneVerifyViewTests(APITestCase):
         otp = cache.get(f"phone_otp_{self.user.phone_number}")
         self.assertIsNone(otp)
 
+    def test_phone_verify_patch_updates_only_verification(self):
+        """
+        Test verifying the phone is one UPDATE, without the unique checks of full_clean.
+        """
+        cache.set(f"phone_otp_{self.user.phone_number}", 0, 600)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, {"otp": "0"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(count_user_writes(queries), (1, 0))
+
     def test_phone_verify_patch_missing_otp(self):
         """
         Test that if no OTP is provided in the PATCH request, the view returns a 400 error.
@@ -1616,6 +1747,36 @@ class PasswordResetViewTests(APITestCase):
             self.user.refresh_from_db()
             self.assertTrue(self.user.check_password(new_password))
 
+    @patch('core_db.models.hashing_service.verify_password', side_effect=HashingUnavailable())
+    def test_password_reset_patch_hashing_unavailable(self, mock_verify_password):
+        """PATCH should return a 503 with Retry-After while the hashing pool is saturated."""
+        future_timestamp = int((now() + timedelta(minutes=10)).timestamp())
+        url = f"{self.url}?token=dummy&expiry={future_timestamp}"
+        with patch('auth_api.views.EmailLink.verify_link', return_value=self.valid_email):
+            response = self.client.patch(
+                url,
+                {"password": "NewPassword1!", "c_password": "NewPassword1!"},
+                format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_password_reset_patch_updates_only_password(self):
+        """PATCH should save the password with one UPDATE, without the unique checks of full_clean."""
+        future_timestamp = int((now() + timedelta(minutes=10)).timestamp())
+        url = f"{self.url}?token=dummy&expiry={future_timestamp}"
+        with patch('auth_api.views.EmailLink.verify_link', return_value=self.valid_email):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.patch(
+                    url,
+                    {"password": "NewPassword1!", "c_password": "NewPassword1!"},
+                    format="json"
+                )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(count_user_writes(queries), (1, 0))
+
 class PublicUserApiTests(APITestCase):
     def setUp(self):
         self.client = APIClient()
@@ -1640,6 +1801,32 @@ class PublicUserApiTests(APITestCase):
         default_image_path = 'profile_images/default_profile.jpg'
         self.assertEqual(user.profile_img.name, default_image_path)
 
+    @patch('core_db.models.hashing_service.make_password', side_effect=HashingUnavailable())
+    def test_create_user_hashing_unavailable(self, mock_make_password):
+        """Test the signup returns a 503 with Retry-After while the hashing pool is saturated."""
+        payload = {
+            'email': 'test@example.com',
+            'password': 'Django@123',
+            'c_password': 'Django@123',
+        }
+        res = self.client.post(self.url, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+        self.assertFalse(get_user_model().objects.filter(email=payload['email']).exists())
+
+    def test_create_user_slug_taken(self):
+        """Test a user whose email has the slug of another user is rejected."""
+        create_user(email='ab@example.com', password='Django@123')
+        payload = {
+            'email': 'a.b@example.com',
+            'password': 'Django@123',
+            'c_password': 'Django@123',
+        }
+        res = self.client.post(self.url, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('slug', res.data)
+        self.assertFalse(get_user_model().objects.filter(email=payload['email']).exists())
+
     def test_create_user_missing_c_password(self):
         """Test that creating a user without c_password returns an error."""
         payload = {
@@ -1887,6 +2074,81 @@ class PublicUserApiTests(APITestCase):
         res = self.client.patch(url, {}, format="json")
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
         
+class UserExportTests(APITestCase):
+    """Test the streaming user export"""
+
+    def setUp(self):
+        self.admin = create_user(email='admin@example.com', password='Django@123', is_staff=True)
+        self.user = create_user(email='user@example.com', password='Django@123', first_name='Plain', phone_number='+8801712345678')
+        self.inactive = create_user(email='inactive@example.com', password='Django@123', is_active=False)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def tearDown(self):
+        cache.clear()
+
+    def content(self, response):
+        """Join the streamed content"""
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_csv(self):
+        """Test the users are streamed as CSV with a header row"""
+        response = self.client.get(USER_EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = self.content(response).splitlines()
+        self.assertTrue(lines[0].startswith('id,email,username,first_name'))
+        self.assertEqual(len(lines), 4)
+        self.assertIn(f'{self.user.id},user@example.com,user@example.com,Plain,,+8801712345678,email,True,False,False,False', lines)
+
+    def test_export_csv_escapes_formulas(self):
+        """Test cells spreadsheets would run as formulas are prefixed with a quote"""
+        create_user(email='formula@example.com', password='Django@123', first_name='=HYPERLINK("http://evil.invalid")', last_name='@SUM(A1)', phone_number='+8801712345679')
+        response = self.client.get(USER_EXPORT_URL, {'export_format': 'csv', 'search': 'formula'})
+
+        row = next(csv.reader(self.content(response).splitlines()[1:]))
+        self.assertEqual(row[3:6], ['\'=HYPERLINK("http://evil.invalid")', "'@SUM(A1)", '+8801712345679'])
+
+    def test_export_ndjson_with_filters(self):
+        """Test the list filters apply to the NDJSON export"""
+        response = self.client.get(USER_EXPORT_URL, {'export_format': 'ndjson', 'is_active': 'true', 'group': 'Default'})
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([row['email'] for row in rows], ['user@example.com'])
+        self.assertEqual(rows[0]['phone_number'], '+8801712345678')
+
+    def test_export_in_blocks(self):
+        """Test the rows are written in blocks while they are read"""
+        with patch('auth_api.exports.EXPORT_BLOCK_SIZE', 50):
+            response = self.client.get(USER_EXPORT_URL)
+            blocks = list(response.streaming_content)
+
+        self.assertEqual(len(blocks), 3)
+
+    def test_export_unknown_format(self):
+        """Test an unknown format is rejected"""
+        response = self.client.get(USER_EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_command(self):
+        """Test the command exports with the same filters"""
+        out = StringIO()
+        call_command('export_users', format='ndjson', is_active='false', stdout=out)
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['email'] for row in rows], ['inactive@example.com'])
+
+    def test_export_admin_only(self):
+        """Test users who aren't admins can't export"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(USER_EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
 class PrivateUserApiTests(APITestCase):
     """Test user API requests that require authentication."""
 
@@ -1900,6 +2162,9 @@ class PrivateUserApiTests(APITestCase):
         self.client.force_authenticate(user=self.user)
         self.url = detail_url(self.user.id)
 
+    def tearDown(self):
+        cache.clear()
+
     #------------------GET------------------#
 
     def test_list_users(self):
@@ -1917,6 +2182,51 @@ class PrivateUserApiTests(APITestCase):
         
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(res.data['role'], 'Default')
+        self.assertEqual(res.data['groups'], ['Default'])
+
+    def test_list_users_role_and_groups(self):
+        """Test the listed users come with their role and group names."""
+        get_user_model().objects.create_superuser(email='admin@example.com', password='Admin@123')
+        
+        res = self.client.get(USER_URL, {'page_size': 10})
+        
+        users = {user['email']: user for user in res.data['results']}
+        self.assertEqual(users['admin@example.com']['role'], 'Superuser')
+        self.assertEqual(users['admin@example.com']['groups'], ['Superuser'])
+        self.assertEqual(users['test@example.com']['role'], 'Default')
+
+    def test_list_users_rows_match_serializer(self):
+        """Test the list rows serialize like the users with UserListSerializer."""
+        get_user_model().objects.create_superuser(email='admin@example.com', password='Admin@123')
+        
+        res = self.client.get(USER_URL, {'page_size': 10})
+        
+        users = get_user_model().objects.prefetch_related('groups')
+        self.assertEqual(res.data['results'], UserListSerializer(users, many=True).data)
+
+    def test_list_users_reads_only_listed_columns(self):
+        """Test the list doesn't read the columns it doesn't return."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(USER_URL)
+        
+        page = next(query['sql'] for query in queries if 'ORDER BY' in query['sql'])
+        self.assertNotIn('"password"', page)
+        self.assertNotIn('"profile_img"', page)
+
+    def test_list_users_queries_constant(self):
+        """Test the number of queries of the list doesn't grow with the page size."""
+        for index in range(6):
+            create_user(email=f'user{index}@example.com', password='Django@123')
+        
+        counts = []
+        for page_size in (2, 7):
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(USER_URL, {'page_size': page_size})
+            self.assertEqual(len(res.data['results']), page_size)
+            counts.append(len(queries))
+        
+        self.assertEqual(counts[0], counts[1])
 
     def test_filter_users_by_search(self):
         """Test filtering users by email or username."""
@@ -1925,6 +2235,31 @@ class PrivateUserApiTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(len(response.data['results']) > 0)
 
+    def test_search_ranks_prefix_matches_first(self):
+        """Test users whose email or username starts with the search value come first."""
+        create_user(email='xmark@example.com', password='Django@123')
+        create_user(email='mark@example.com', password='Django@123')
+        create_user(email='amark@example.com', password='Django@123')
+        
+        response = self.client.get(USER_URL, {'search': 'mark', 'page_size': 10})
+        
+        self.assertEqual(
+            [user['email'] for user in response.data['results']],
+            ['mark@example.com', 'amark@example.com', 'xmark@example.com']
+        )
+
+    def test_search_short_value_contains(self):
+        """Test values shorter than a trigram still match anywhere, prefix matches first."""
+        create_user(email='te@example.com', password='Django@123')
+        create_user(email='site@example.com', password='Django@123')
+        
+        response = self.client.get(USER_URL, {'search': 'te', 'page_size': 10})
+        
+        self.assertEqual(
+            [user['email'] for user in response.data['results']],
+            ['te@example.com', 'test@example.com', 'site@example.com']
+        )
+
     def test_filter_users_by_group(self):
         """Test filtering users by group name."""
         response = self.client.get(USER_URL, {'group': 'admin'})
@@ -1940,6 +2275,74 @@ class PrivateUserApiTests(APITestCase):
         self.assertIn('next', response.data)
         self.assertIn('previous', response.data)
         
+    def test_cursor_pagination(self):
+        """Test the cursor pagination walks the users in (email, id) order."""
+        for email in ('c@example.com', 'a@example.com', 'b@example.com'):
+            create_user(email=email, password='Django@123')
+        
+        emails = []
+        url = USER_URL + '?pagination=cursor'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            emails += [user['email'] for user in response.data['results']]
+            url = response.data['next']
+        
+        self.assertEqual(emails, ['a@example.com', 'b@example.com', 'c@example.com', 'test@example.com'])
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(response.data['total_pages'], 2)
+
+    def test_cursor_pagination_count_cached(self):
+        """Test the next pages reuse the cached count instead of counting."""
+        for email in ('a@example.com', 'b@example.com'):
+            create_user(email=email, password='Django@123')
+        first = self.client.get(USER_URL, {'pagination': 'cursor'})
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(first.data['next'])
+        
+        self.assertEqual(response.data['count'], 3)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+        self.assertFalse(any('OFFSET' in query['sql'] for query in queries))
+
+    def test_pagination_approximate_count(self):
+        """Test the page number pagination uses the cached count with count=approximate."""
+        self.client.get(USER_URL, {'count': 'approximate'})
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(USER_URL, {'count': 'approximate'})
+        
+        self.assertEqual(response.data['count'], 1)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+        
+    def test_pagination_low_estimate_serves_last_pages(self):
+        """Test a count estimate below the real count doesn't hide the last pages."""
+        for index in range(4):
+            create_user(email=f'user{index}@example.com', password='Django@123')
+        
+        with patch('auth_api.paginations.approximate_count', return_value=1):
+            first = self.client.get(USER_URL, {'count': 'approximate', 'page_size': 2})
+            last = self.client.get(USER_URL, {'count': 'approximate', 'page_size': 2, 'page': 3})
+        
+        self.assertEqual((first.data['count'], first.data['total_pages']), (1, 1))
+        self.assertIsNotNone(first.data['next'])
+        self.assertEqual(last.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(last.data['results']), 1)
+        self.assertIsNone(last.data['next'])
+
+    def test_pagination_high_estimate_ends_at_last_page(self):
+        """Test a count estimate above the real count doesn't link past the last page."""
+        create_user(email='other@example.com', password='Django@123')
+        
+        with patch('auth_api.paginations.approximate_count', return_value=100):
+            response = self.client.get(USER_URL, {'count': 'approximate', 'page_size': 2})
+            beyond = self.client.get(USER_URL, {'count': 'approximate', 'page_size': 2, 'page': 2})
+        
+        self.assertEqual(response.data['total_pages'], 50)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(beyond.status_code, status.HTTP_404_NOT_FOUND)
+
     #------------------CREATE------------------#
     
     def test_create_admin_success(self):
@@ -2254,6 +2657,15 @@ class PrivateUserDeactivationTests(APITestCase):
         self.normal_user.refresh_from_db()
         self.assertFalse(self.normal_user.is_active)
 
+    def test_deactivate_updates_only_is_active(self):
+        """Test deactivating is one UPDATE, without the unique checks of full_clean"""
+        self.client.force_authenticate(user=self.superuser)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(deactivate_user_url(self.normal_user.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(count_user_writes(queries), (1, 0))
+
     def test_staff_can_deactivate_a_normal_user(self):
         """Test that a staff user can deactivate a normal user"""
         self.client.force_authenticate(user=self.staff_user)
@@ -2370,6 +2782,15 @@ class PrivateUserActivationTests(APITestCase):
         self.normal_user.refresh_from_db()
         self.assertTrue(self.normal_user.is_active)
 
+    def test_activate_updates_only_is_active(self):
+        """Test activating is one UPDATE, without the unique checks of full_clean"""
+        self.client.force_authenticate(user=self.superuser)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(activate_user_url(self.normal_user.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(count_user_writes(queries), (1, 0))
+
     def test_staff_can_activate_a_normal_user(self):
         """Test that a staff user can activate a normal user"""
         self.client.force_authenticate(user=self.staff_user)
@@ -2568,6 +2989,26 @@ class SocialAuthViewTests(APITestCase):
         self.assertEqual(response.data["user_role"], "User")
         self.assertEqual(response.data["user_id"], self.user.id)
 
+    def test_pipeline_updates_only_profile_image(self):
+        """Test the pipeline updates the image of an existing social user with one UPDATE"""
+        self.user.auth_provider = 'github'
+        self.user.save()
+        response = {'email': self.user.email, 'avatar_url': 'https://example.com/avatar.png'}
+
+        with CaptureQueriesContext(connection) as queries:
+            user = user_creation(type('Backend', (), {'name': 'github'})(), None, response)
+
+        self.assertEqual(user.profile_img, 'https://example.com/avatar.png')
+        self.assertEqual(count_user_writes(queries), (1, 0))
+
+    @patch('core_db.models.hashing_service.make_password', side_effect=HashingUnavailable())
+    def test_pipeline_hashing_unavailable(self, mock_make_password):
+        """Test the pipeline returns a 503 with Retry-After while the hashing pool is saturated"""
+        response = user_creation(type('Backend', (), {'name': 'github'})(), None, {'email': 'new@example.com', 'name': 'New User'})
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+
     def test_auth_exception(self):
         """Simulate that backend.do_auth raises an AuthException."""
         # Update the side_effect to pass two arguments to AuthException:
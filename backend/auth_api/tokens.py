@@ -0,0 +1,54 @@
+"""JWT tokens carrying the user claims used for stateless authentication."""
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from core_db.roles import get_user_role
+from .backends import token_backend
+from .blacklist import blacklist_filter
+
+
+# Claims copied from the user into every issued token
+USER_CLAIMS = ('is_active', 'is_staff', 'is_superuser', 'role')
+
+
+def set_user_claims(token, user):
+    """Embed the user claims in the token."""
+    token['is_active'] = user.is_active
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    token['role'] = get_user_role(user)
+
+    return token
+
+class UserAccessToken(AccessToken):
+    """Access token signed and verified with the key ring."""
+    _token_backend = token_backend
+
+class UserRefreshToken(RefreshToken):
+    """Refresh token whose claims are copied to the access tokens it creates."""
+    _token_backend = token_backend
+    access_token_class = UserAccessToken
+
+    @classmethod
+    def for_user(cls, user):
+        """Create a refresh token for the user with the user claims embedded."""
+        token = super().for_user(user)
+        return set_user_claims(token, user)
+
+    def check_blacklist(self):
+        """Look up the blacklist only when the jti is probably on it."""
+        if not blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            return
+
+        try:
+            super().check_blacklist()
+        except TokenError:
+            blacklist_filter.record(True)
+            raise
+        blacklist_filter.record(False)
+
+    def blacklist(self):
+        """Blacklist the token and add its jti to the filter."""
+        blacklisted = super().blacklist()
+        blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, async_views
 
 
 # basename will be singluar eg user
@@ -24,4 +24,11 @@ urlpatterns = [
     path('token/', views.TokenView.as_view(), name='token'),
     path('token/refresh/', views.RefreshTokenView.as_view(), name='token-refresh'),
     path('social-auth/', views.SocialAuthView.as_view(), name='social-auth'),
+    path('.well-known/jwks.json', views.JWKSView.as_view(), name='jwks'),
+
+    # ASGI native versions of the login flow
+    path('async/login/', async_views.LoginView.as_view(), name='async-login'),
+    path('async/logout/', async_views.LogoutView.as_view(), name='async-logout'),
+    path('async/token/', async_views.TokenView.as_view(), name='async-token'),
+    path('async/token/refresh/', async_views.RefreshTokenView.as_view(), name='async-token-refresh'),
 ]
\ No newline at end of file
@@ -1,10 +1,12 @@
-import random, uuid
+import random, time, uuid
 from datetime import datetime, timezone, timedelta
 from urllib.parse import urlencode
 from django.core.cache import cache
 from django.conf import settings
-from django.core.mail import EmailMessage
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from .caching import pop, apop
+from .mail import send_mail_message
+from .emails import EMAIL_TEMPLATES
 # from twilio.rest import Client
 
 
@@ -23,33 +25,71 @@ class EmailOtp:
     def send_email_otp(email, otp):
         """Send an OTP to the user's email."""
         try:
-            email = EmailMessage(
-                subject = '2 Factor Login Authentication',
-                body = f'Hi {email}, Welcome to {APP_NAME}\n\nYour OTP code is: {otp}\n\nThe OTP will expire in 10 minutes',
-                to = [email]
-            )
-            email.send()
+            email_message = EMAIL_TEMPLATES["login_otp"].render(email, email=email, otp=otp)
             
-            return True
+            # Queued, the request doesn't wait for SMTP
+            return send_mail_message(email_message) is not None
         except Exception as e:
             return False
         
     @staticmethod
-    def verify_otp(user_id, request_otp):
+    def verify_otp(stored_otp, request_otp):
         """Verify the OTP sent to the user's email."""
-        stored_otp = cache.get(f'otp_{user_id}')
-        
         try:
             request_otp = int(request_otp)
         except Exception as e:
             # print(e)
             return False
         
-        if stored_otp != request_otp:
-            return False
-        else:
-            cache.delete(f'otp_{request_otp}')
-            return True
+        return stored_otp == request_otp
+
+class LoginSession:
+    """
+    Login state kept between the password check and the OTP verification,
+    a single cache record per user so it expires as a whole.
+    """
+    TIMEOUT = 600  # 10 minutes
+    RESEND_WINDOW = 60  # OTP requests are throttled for 1 minute after an OTP is sent
+    
+    @staticmethod
+    def key(user_id):
+        return f"login_session_{user_id}"
+    
+    @staticmethod
+    def create(otp, email, password):
+        return {"otp": otp, "email": email, "password": password, "issued_at": time.time()}
+    
+    @classmethod
+    def start(cls, user_id, otp, email, password):
+        """Store the OTP and the credentials verified with it."""
+        cache.set(cls.key(user_id), cls.create(otp, email, password), timeout=cls.TIMEOUT)
+    
+    @classmethod
+    async def astart(cls, user_id, otp, email, password):
+        await cache.aset(cls.key(user_id), cls.create(otp, email, password), timeout=cls.TIMEOUT)
+    
+    @classmethod
+    def get(cls, user_id):
+        """Return the login session of the user, None when it expired."""
+        return cache.get(cls.key(user_id))
+    
+    @classmethod
+    async def aget(cls, user_id):
+        return await cache.aget(cls.key(user_id))
+    
+    @staticmethod
+    def is_recent(session):
+        """Check if the OTP of the session was sent within the resend window."""
+        return bool(session) and time.time() - session["issued_at"] < LoginSession.RESEND_WINDOW
+    
+    @classmethod
+    def pop(cls, user_id):
+        """Atomically end the login session, None when it expired or was already used."""
+        return pop(cls.key(user_id))
+    
+    @classmethod
+    async def apop(cls, user_id):
+        return await apop(cls.key(user_id))
         
 class EmailLink:
     """Email Link Sender and Verifier."""
@@ -101,13 +141,8 @@ class EmailLink:
         link = cls._generate_link(email, 'email-verification')
         
         try:
-            email_message = EmailMessage(
-                subject="Verify Your Email",
-                body=f"Hi {email}, Welcome to {APP_NAME}\n\nPlease verify your email using the following link: {link}\n\nThis link will expire in 10 minutes.",
-                to=[email]
-            )
-            email_message.send()
-            return True
+            email_message = EMAIL_TEMPLATES["email_verification"].render(email, email=email, link=link)
+            return send_mail_message(email_message) is not None
         except Exception as e:
             return False
         
@@ -117,13 +152,8 @@ class EmailLink:
         link = cls._generate_link(email, 'password-reset')
         
         try:
-            email_message = EmailMessage(
-                subject="Reset Your Password",
-                body=f"Hi {email}, Welcome to {APP_NAME}\n\nPlease reset your password using the following link: {link}\n\nThis link will expire in 10 minutes.",
-                to=[email]
-            )
-            email_message.send()
-            return True
+            email_message = EMAIL_TEMPLATES["password_reset"].render(email, email=email, link=link)
+            return send_mail_message(email_message) is not None
         except Exception as e:
             return False
         
@@ -8,9 +8,9 @@ from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import Throttled
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django_filters.rest_framework import DjangoFilterBackend
@@ -20,22 +20,31 @@ from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.utils.timezone import now
 from django.middleware.csrf import get_token
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_protect
 from social_django.utils import load_backend, load_strategy
 from social_core.exceptions import AuthException
+from core_db.roles import get_user_role
+from core_db.hashing import HashingUnavailable
 from .renderers import ViewRenderer
-from .paginations import UserPagination
+from .authentication import StatelessJWTAuthentication
+from .tokens import UserRefreshToken
+from .paginations import UserPagination, UserCursorPagination
 from .filters import UserFilter
+from .exports import EXPORT_FORMATS, stream_export, astream_export
 from .utils import (
     EmailOtp,
     EmailLink,
+    LoginSession,
     PhoneOtp
 )
 from .serializers import (
     UserSerializer,
     UserImageSerializer,
     UserListSerializer,
+    UserRowSerializer,
     UserActionSerializer,
     RecaptchaSerializer,
     LoginSerializer,
@@ -73,41 +82,34 @@ def check_token_validity(request):
     
     return email
     
-def check_user_validity(email):
-    """Check if user is valid using email."""
-    user = get_user_model().objects.filter(email=email).first()
-        
+def user_validity_error(user):
+    """Return why the user can't login with email and password, None if they can."""
     # Check if user exists
     if not user:
-        return Response({"error": "Invalid credentials"}, status=status.HTTP_400_BAD_REQUEST)
+        return "Invalid credentials"
     
     if user.auth_provider != 'email':
-        return Response({"error": f"This process cannot be used, as user is created using {user.auth_provider}"}, status=status.HTTP_400_BAD_REQUEST)
+        return f"This process cannot be used, as user is created using {user.auth_provider}"
     
     # Check if user is email verified
     if not user.is_email_verified:
-        return Response({"error": "Email is not verified. You must verify your email first"}, status=status.HTTP_400_BAD_REQUEST)
+        return "Email is not verified. You must verify your email first"
     
     # Check if user is active
     if not user.is_active:
-        return Response({"error": "Account is deactivated. Contact your admin"}, status=status.HTTP_400_BAD_REQUEST)
-        
-    return user
+        return "Account is deactivated. Contact your admin"
+    
+    return None
 
-def get_user_role(user):
-    """Get user role."""
-    user_groups = user.groups.all()
+def check_user_validity(email):
+    """Check if user is valid using email."""
+    user = get_user_model().objects.filter(email=email).first()
     
-    if user_groups.filter(name='Default').exists():
-        user_role = 'Default'
-    elif user_groups.filter(name='Admin').exists():
-        user_role = 'Admin'
-    elif user_groups.filter(name='Superuser').exists():
-        user_role = 'Superuser'
-    else:
-        user_role = 'UnAuthorized'
+    error = user_validity_error(user)
+    if error:
+        return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
         
-    return user_role
+    return user
 
 def check_user_id(user_id):
     """Check if user id is valid."""
@@ -127,6 +129,25 @@ def check_user_id(user_id):
     
     return check_user_validity(user.email)
 
+def record_failed_login(user):
+    """Count a failed login and lock the account at the limit. Returns the error message."""
+    user.failed_login_attempts = get_user_model().objects.record_failed_login(
+        user.pk, timedelta(minutes=10), settings.MAX_LOGIN_FAILURE_LIMIT
+    )
+    
+    if user.failed_login_attempts == settings.MAX_LOGIN_FAILURE_LIMIT:
+        # Account locked
+        if user.is_superuser:
+            return "Invalid credentials. Your account is deactivated. Verify your email."
+        else:
+            return "Invalid credentials. Your account is deactivated. Contact an admin."
+    
+    if user.failed_login_attempts >= 3:
+        remaining_attempts = settings.MAX_LOGIN_FAILURE_LIMIT - user.failed_login_attempts
+        return f"Invalid credentials. You have {remaining_attempts} more attempt(s) before your account is deactivated."
+    
+    return "Invalid credentials"
+
 def create_otp(user_id, email, password):
     """Generate a 6 digit OTP and send it to the user's email."""
     otp = EmailOtp.generate_otp()
@@ -134,11 +155,8 @@ def create_otp(user_id, email, password):
     
     # Check if the email was sent
     if otp_email:
-        # Setting the cache data
-        cache.set(f"id_{user_id}", user_id, timeout=60) # Cache id for 1 minute (used for email verification)
-        cache.set(f"otp_{user_id}", otp, timeout=600) # Cache otp for 1 minute (used for otp verification)
-        cache.set(f"email_{user_id}", email, timeout=600) # Cache email for 10 minutes (used for otp verification)
-        cache.set(f"password_{user_id}", password, timeout=600)  # Store password in cache for verification
+        # Start the login session verified by the OTP
+        LoginSession.start(user_id, otp, email, password)
         return Response({"success": "Email sent", "otp": True, "user_id": user_id}, status=status.HTTP_200_OK)
     else:
         return Response({"error": "Something went wrong, could not send OTP. Try again", "otp": False}, status=status.HTTP_400_BAD_REQUEST)
@@ -290,19 +308,18 @@ class LoginView(APIView):
     
     def check_throttles(self, request):
         """
-        Check if request should be throttled.
+        The throttle only applies to sending an OTP, see throttle_otp(),
+        so wrong passwords are still counted while it is exceeded.
+        """
+
+    def throttle_otp(self, request, user):
+        """
+        Check if the OTP request of the user should be throttled.
         Raises an appropriate exception if the request is throttled.
         """
         throttle_durations = check_throttle_duration(self, request)
-                
-        user = get_user_model().objects.filter(email=request.data.get('email')).first()
-        
-        if user:
-            cached_id = cache.get(f"id_{user.id}")
-        else:
-            cached_id = None
 
-        if throttle_durations and cached_id:
+        if throttle_durations and LoginSession.is_recent(LoginSession.get(user.id)):
             start_throttle(self, throttle_durations, request)
 
     @extend_schema(
@@ -381,49 +398,23 @@ class LoginView(APIView):
             
             # Check if password is correct
             if not user.check_password(password):
-                # Increment failed login attempts
-                if now() - user.last_failed_login_time <= timedelta(minutes=10):
-                    user.failed_login_attempts += 1
-                else:
-                    user.failed_login_attempts = 1
-                    
-                user.last_failed_login_time = now()
-                user.save()
-                
-                if user.failed_login_attempts == settings.MAX_LOGIN_FAILURE_LIMIT:
-                    # Lock account
-                    if user.is_superuser:
-                        user.is_email_verified = False
-                        user.save()
-                        return Response({
-                            "error": "Invalid credentials. Your account is deactivated. Verify your email."
-                        }, status=status.HTTP_400_BAD_REQUEST)
-                    else:
-                        user.is_active = False
-                        user.save()
-                        return Response({
-                            "error": "Invalid credentials. Your account is deactivated. Contact an admin."
-                        }, status=status.HTTP_400_BAD_REQUEST)
-                
-                if user.failed_login_attempts >= 3:
-                    remaining_attempts = settings.MAX_LOGIN_FAILURE_LIMIT - user.failed_login_attempts
-                    return Response({
-                        "error": f"Invalid credentials. You have {remaining_attempts} more attempt(s) before your account is deactivated."
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                    
-                
-                return Response({"error": "Invalid credentials"}, status=status.HTTP_400_BAD_REQUEST)
+                return Response({"error": record_failed_login(user)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            self.throttle_otp(request, user)
             
             # Reset failed login attempts
             if user.failed_login_attempts > 0:
-                user.failed_login_attempts = 0
-                user.save()
+                get_user_model().objects.filter(pk=user.pk).update(failed_login_attempts=0)
             
             # Generate OTP
             response = create_otp(user.id, email, password)
             
             return response
         
+        except Throttled:
+            raise
+        except HashingUnavailable as e:
+            return Response({"error": e.detail}, status=e.status_code, headers={"Retry-After": str(e.wait)})
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
@@ -441,9 +432,9 @@ class ResendOtpView(APIView):
         """
         throttle_durations = check_throttle_duration(self, request)
                 
-        cached_id = cache.get(f"id_{request.data.get('user_id')}")
+        otp_sent = LoginSession.is_recent(LoginSession.get(request.data.get('user_id')))
 
-        if throttle_durations and cached_id:
+        if throttle_durations and otp_sent:
             start_throttle(self, throttle_durations, request)
     
     @extend_schema(
@@ -514,14 +505,13 @@ class ResendOtpView(APIView):
             if isinstance(user, Response):
                 return user
             
-            email = cache.get(f"email_{user.id}")
-            password = cache.get(f"password_{user.id}")
+            session = LoginSession.get(user.id)
             
-            if not email or not password:
+            if not session:
                 return Response({"error": "Session expired. Please login again."}, status=status.HTTP_400_BAD_REQUEST)
             
             # Generate OTP
-            response = create_otp(user.id, email, password)
+            response = create_otp(user.id, session["email"], session["password"])
             
             return response
         
@@ -594,31 +584,34 @@ class TokenView(TokenObtainPairView):
             if isinstance(user, Response):
                 return user
             
-            # Get email and password from the cache
-            email = cache.get(f"email_{user.id}")
-            password = cache.get(f"password_{user.id}")
+            # Get the OTP, email and password from the login session
+            session = LoginSession.get(user.id)
 
-            if not email or not password:
+            if not session:
                 return Response({"error": "Session expired. Please login again."}, status=status.HTTP_400_BAD_REQUEST)
             
             # Verify OTP
-            otp_verify = EmailOtp.verify_otp(user.id, otp_from_request)
+            otp_verify = EmailOtp.verify_otp(session["otp"], otp_from_request)
             
             if not otp_verify:
                 return Response({"error": "Invalid OTP"}, status=status.HTTP_400_BAD_REQUEST)
 
+            # End the session, so a concurrent request with the same OTP can't use it.
+            # A resend may have started another session since, its OTP wasn't verified.
+            verified, session = session, LoginSession.pop(user.id)
+            
+            if not session or session["issued_at"] != verified["issued_at"]:
+                return Response({"error": "Session expired. Please login again."}, status=status.HTTP_400_BAD_REQUEST)
+
             # Set email and password in the request
-            request.data['email'] = email
-            request.data['password'] = password
+            request.data['email'] = session["email"]
+            request.data['password'] = session["password"]
             
             # Generate token
             response = super().post(request, *args, **kwargs)
             
             response.data['access_token_expiry'] = (now() + timedelta(minutes=5)).isoformat()
             
-            cache.delete(f"email_{user.id}")
-            cache.delete(f"password_{user.id}")
-            
             user_role = get_user_role(user)
             
             response.data['user_role'] = user_role
@@ -627,13 +620,11 @@ class TokenView(TokenObtainPairView):
             response.data['refresh_token'] = response.data['refresh']
             response.data.pop('access')
             response.data.pop('refresh')
-            
-            # Delete cache entries after successful login
-            cache.delete(f"email_{user.id}")
-            cache.delete(f"password_{user.id}")
 
             return response
         
+        except HashingUnavailable as e:
+            return Response({"error": e.detail}, status=e.status_code, headers={"Retry-After": str(e.wait)})
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
@@ -717,8 +708,8 @@ class RefreshTokenView(TokenRefreshView):
             if not refresh_token or not access_token:
                 return Response({"error": "Invalid tokens"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Decode the access token to extract user details
-            decoded_token = RefreshToken(refresh_token)
+            # Decode the refresh token just issued to extract user details, no blacklist check needed
+            decoded_token = UserRefreshToken(refresh_token, verify=False)
             user_id = decoded_token.get('user_id', None)
             if not user_id:
                 raise InvalidToken("Invalid refresh token")
@@ -833,7 +824,7 @@ class EmailVerifyView(APIView):
             
             user.is_active = True
             user.is_email_verified = True
-            user.save()
+            user.save(update_fields=["is_active", "is_email_verified"])
             
             return Response({"success": "Email verified successfully"}, status=status.HTTP_200_OK)
         
@@ -1092,7 +1083,7 @@ class PhoneVerifyView(APIView):
             
             if otp_verified:
                 user.is_phone_verified = True
-                user.save()
+                user.save(update_fields=["is_phone_verified"])
                 return Response({"success": "Phone verified successfully"}, status=status.HTTP_200_OK)
             else:
                 return Response({"error": "Invalid OTP"}, status=status.HTTP_400_BAD_REQUEST)
@@ -1373,11 +1364,15 @@ class PasswordResetView(APIView):
         
         return Response({"success": "Password reset successful."}, status=status.HTTP_200_OK)
         
+# Columns of the user read by UserSerializer
+RETRIEVE_FIELDS = [field for field in UserSerializer.Meta.fields if field not in ('password', 'role', 'groups')]
+
 class UserViewSet(ModelViewSet):
     """Viewset for User APIs."""
     queryset = get_user_model().objects.all() # get all the users
     serializer_class = UserSerializer # User Serializer initialized
     authentication_classes = [JWTAuthentication] # Using jwtoken
+    stateless_authentication_actions = ('retrieve',) # Actions authenticated from the token claims only
     throttle_classes = [ScopedRateThrottle]
     throttle_scope = 'email_verify'
     renderer_classes = [ViewRenderer]
@@ -1386,22 +1381,55 @@ class UserViewSet(ModelViewSet):
     pagination_class = UserPagination
     http_method_names = ['get', 'post', 'patch', 'delete']
 
+    def get_authenticators(self):
+        """Skip the user lookup for actions which don't need the full user."""
+        action_map = getattr(self, 'action_map', None) or {}
+        request = getattr(self, 'request', None)
+
+        if request is not None and action_map.get(request.method.lower()) in self.stateless_authentication_actions:
+            return [StatelessJWTAuthentication()]
+
+        return super().get_authenticators()
+
     def get_permissions(self):
         """Permission for CRUD operations."""
         if self.action == 'create': # No permission while creating user
             permission_classes = [AllowAny]
         elif self.action == 'deactivate_user': # Only Admins are allowed
             permission_classes = [IsAuthenticated]
-        elif (self.action == 'activate_user' or self.action == 'delete'): # Only Admins are allowed
+        elif (self.action == 'activate_user' or self.action == 'delete' or self.action == 'export'): # Only Admins are allowed
             permission_classes = [IsAuthenticated, IsAdminUser]
         else: # RUD operations need permissions
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
 
+    @property
+    def paginator(self):
+        """Keyset pagination instead of page numbers with ?pagination=cursor."""
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = UserCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        """
+        Load only the columns the serializer of the action reads.
+        The list is read as rows instead of users, retrieve skips the password and login columns.
+        Actions saving the user load all of it.
+        """
+        queryset = super().get_queryset()
+        if self.action == "list":
+            return queryset.values(*UserRowSerializer.columns)
+        if self.action == "retrieve":
+            return queryset.only(*RETRIEVE_FIELDS).prefetch_related('groups')
+        return queryset
+
     def get_serializer_class(self):
         """Return the serializer class for the action."""
-        if self.action == "list": # List of users handled with different serializer
-            return UserListSerializer
+        if self.action == "list": # List of users handled with the rows serializer, same output as UserListSerializer
+            return UserRowSerializer
         if self.action == "deactivate_user" or self.action == "activate_user": # Deactivation handled with different serializer
             return UserActionSerializer
         if self.action == "upload_image": # Image handled with different serializer
@@ -1431,6 +1459,20 @@ class UserViewSet(ModelViewSet):
     @extend_schema(
         summary="Get All Users List",
         description="List of all users using Pagination and Filters.",
+        parameters=[
+            OpenApiParameter(
+                name="pagination",
+                description="cursor for keyset pagination on (email, id), follow the next and previous links.",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="count",
+                description="approximate to use the estimated count with page numbers. The cursor pagination always does.",
+                required=False,
+                type=str,
+            ),
+        ],
         responses={
             200: UserListSerializer,
             400: OpenApiResponse(
@@ -1456,6 +1498,49 @@ class UserViewSet(ModelViewSet):
     def list(self, request, *args, **kwargs):
         return super().list(request, args, kwargs)
     
+    @extend_schema(
+        summary="Export Users",
+        description="Stream all the users matching the list filters as CSV or NDJSON (only admins can do this).",
+        parameters=[
+            OpenApiParameter(
+                name="export_format",
+                description="csv (default) or ndjson.",
+                required=False,
+                type=str,
+            ),
+        ],
+        responses={
+            200: OpenApiResponse(description="CSV with a header row, or one JSON object per line."),
+            400: OpenApiResponse(
+                description="Bad Request - Unknown export format",
+                response={
+                    "type": "object",
+                    "properties": {
+                        "errors": {"type": "string", "example": "Unknown export format, use csv or ndjson."}
+                    },
+                },
+            ),
+        }
+    )
+    @action(detail=False, methods=['GET'], url_path='export')
+    def export(self, request):
+        """Stream the filtered users, reading them in chunks"""
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({"error": "Unknown export format, use csv or ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        
+        # An ASGI server buffers a sync iterator entirely, give it an async one
+        if isinstance(request._request, ASGIRequest):
+            content = astream_export(queryset, export_format)
+        else:
+            content = stream_export(queryset, export_format)
+        
+        response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = f'attachment; filename="users.{export_format}"'
+        return response
+    
     @extend_schema(
         summary="Get Single User",
         description="Get everything of a single user by ID.",
@@ -2072,7 +2157,7 @@ class UserViewSet(ModelViewSet):
                 )
             
             user_to_deactivate.is_active = False
-            user_to_deactivate.save()
+            user_to_deactivate.save(update_fields=["is_active"])
 
             return Response(
                 {"success": f"User {user_to_deactivate.email} has been deactivated."},
@@ -2165,7 +2250,7 @@ class UserViewSet(ModelViewSet):
                 )
 
             user_to_activate.is_active = True
-            user_to_activate.save()
+            user_to_activate.save(update_fields=["is_active"])
 
             return Response(
                 {"success": f"User {user_to_activate.email} has been reactivated."},
@@ -2233,7 +2318,7 @@ class LogoutView(APIView):
                 return Response({"error": "Tokens are required"}, status=status.HTTP_400_BAD_REQUEST)
 
             # Blacklist refresh token
-            token = RefreshToken(refresh_token)
+            token = UserRefreshToken(refresh_token)
             token.blacklist()
 
             return Response({"success": "Logged out successfully"}, status=status.HTTP_200_OK)
@@ -2241,6 +2326,40 @@ class LogoutView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
+class JWKSView(APIView):
+    """
+    JSON Web Key Set of the token verifying keys. Downstream services use it
+    to verify access tokens locally, picking the key by the token's kid.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    renderer_classes = [ViewRenderer]
+    
+    @extend_schema(
+        summary="JSON Web Key Set",
+        description="Returns the public keys used to verify the issued tokens, identified by their kid.",
+        responses={
+            200: OpenApiResponse(
+                description="JSON Web Key Set",
+                response={
+                    "type": "object",
+                    "properties": {
+                        "keys": {
+                            "type": "array",
+                            "items": {"type": "object"},
+                            "example": [{"kty": "RSA", "n": "modulus", "e": "AQAB", "kid": "key id", "use": "sig", "alg": "RS256"}]
+                        }
+                    },
+                },
+            ),
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        """Get the JSON Web Key Set."""
+        response = Response(settings.JWT_KEYRING.jwks(), status=status.HTTP_200_OK)
+        response['Cache-Control'] = 'public, max-age=300'
+        return response
+        
 class SocialAuthView(APIView):
     permission_classes = [AllowAny]
     renderer_classes = [ViewRenderer]
@@ -2312,7 +2431,7 @@ class SocialAuthView(APIView):
                 if not user.is_active:
                     return Response({"error": "Account is deactivated. Contact your admin."}, status=400)
                 # Generate JWT tokens for the authenticated user
-                refresh = RefreshToken.for_user(user)
+                refresh = UserRefreshToken.for_user(user)
                 access_token_expiry = (now() + timedelta(minutes=5)).isoformat()
                 user_role = get_user_role(user)
                 
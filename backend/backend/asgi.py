@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Expired refresh tokens are pruned by `manage.py prune_tokens` unless scheduled in process
+if settings.TOKEN_PRUNING_SCHEDULE:
+    from auth_api.pruning import start_scheduler
+    start_scheduler()
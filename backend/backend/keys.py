@@ -0,0 +1,138 @@
+"""
+Signing key management.
+
+The PEM files are parsed once at startup into `cryptography` key objects,
+PyJWT uses key objects as they are instead of parsing the PEM material
+again for every token it signs or verifies.
+
+Keys are identified by their RFC 7638 thumbprint (`kid`). Issued tokens
+carry the `kid` of the signing key in their header, so keys can be rotated
+while tokens signed by the previous keys are still verified.
+"""
+import base64, hashlib, json
+from collections import namedtuple
+from jwt.algorithms import get_default_algorithms
+from jwt.exceptions import InvalidKeyError
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, ed448, rsa
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+)
+
+
+# Members of each key type used for the thumbprint (RFC 7638 section 3.2)
+THUMBPRINT_MEMBERS = {
+    "RSA": ("e", "kty", "n"),
+    "EC": ("crv", "kty", "x", "y"),
+    "OKP": ("crv", "kty", "x"),
+}
+
+# Elliptic curve of each ECDSA algorithm
+EC_CURVES = {
+    "ES256": ec.SECP256R1,
+    "ES384": ec.SECP384R1,
+    "ES512": ec.SECP521R1,
+}
+CURVE_ALGORITHMS = {curve.name: algorithm for algorithm, curve in EC_CURVES.items()}
+
+VerifyingKey = namedtuple("VerifyingKey", ("key", "algorithm"))
+
+
+def read_key_file(path):
+    """Read the PEM material from a key file."""
+    with open(path, "rb") as key_file:
+        return key_file.read()
+
+def load_private_key(path, password=None):
+    """Parse a PEM private key file into a key object."""
+    return load_pem_private_key(read_key_file(path), password=password)
+
+def load_public_key(path):
+    """Parse a PEM public key file into a key object."""
+    return load_pem_public_key(read_key_file(path))
+
+def key_algorithm(key):
+    """Return the default JWT algorithm for the type of a private or public key."""
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return "RS256"
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)):
+        if key.curve.name in CURVE_ALGORITHMS:
+            return CURVE_ALGORITHMS[key.curve.name]
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey,
+                        ed448.Ed448PrivateKey, ed448.Ed448PublicKey)):
+        return "EdDSA"
+
+    raise ValueError(f"Unsupported signing key type: {type(key).__name__}")
+
+def generate_private_key(algorithm):
+    """Generate a new private key for the algorithm (RS*, ES* or EdDSA)."""
+    if algorithm.startswith(("RS", "PS")):
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if algorithm in EC_CURVES:
+        return ec.generate_private_key(EC_CURVES[algorithm]())
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+
+    raise ValueError(f"Unsupported signing algorithm: {algorithm}")
+
+def public_jwk(public_key, algorithm):
+    """Return the public key as a JWK dictionary."""
+    return get_default_algorithms()[algorithm].to_jwk(public_key, as_dict=True)
+
+def key_id(jwk):
+    """Compute the RFC 7638 thumbprint of a JWK."""
+    members = {name: jwk[name] for name in THUMBPRINT_MEMBERS[jwk["kty"]]}
+    canonical = json.dumps(members, separators=(",", ":"), sort_keys=True)
+    digest = hashlib.sha256(canonical.encode()).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+class KeyRing:
+    """
+    The active signing key and every public key still accepted for
+    verification, indexed by `kid`. Each verifying key keeps its own
+    algorithm, so tokens signed before switching algorithms still verify.
+    """
+
+    def __init__(self, signing_key, verifying_key, algorithm):
+        try:
+            get_default_algorithms()[algorithm].prepare_key(signing_key)
+        except (TypeError, InvalidKeyError) as ex:
+            raise ValueError(f"The signing key can't be used with {algorithm}") from ex
+
+        self.algorithm = algorithm
+        self.signing_key = signing_key
+        self.verifying_key = verifying_key
+        self._verifying_keys = {}
+        self._jwks = []
+        self.signing_kid = self.add_verifying_key(verifying_key, algorithm)
+
+    def add_verifying_key(self, public_key, algorithm=None):
+        """Accept tokens signed by the private half of `public_key`, returns its kid."""
+        algorithm = algorithm or key_algorithm(public_key)
+        jwk = public_jwk(public_key, algorithm)
+        kid = key_id(jwk)
+
+        if kid not in self._verifying_keys:
+            self._verifying_keys[kid] = VerifyingKey(public_key, algorithm)
+            self._jwks.append({**jwk, "kid": kid, "use": "sig", "alg": algorithm})
+
+        return kid
+
+    def get_verifying_key(self, kid):
+        """Return the verifying key for the kid, None when it is unknown."""
+        return self._verifying_keys.get(kid)
+
+    def find_verifying_key(self, algorithm):
+        """Return a verifying key for the algorithm, preferring the active key."""
+        if algorithm == self.algorithm:
+            return self._verifying_keys[self.signing_kid]
+
+        for verifying_key in self._verifying_keys.values():
+            if verifying_key.algorithm == algorithm:
+                return verifying_key
+
+        return None
+
+    def jwks(self):
+        """Return the JSON Web Key Set of the verifying keys."""
+        return {"keys": list(self._jwks)}
@@ -10,10 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
-import os
+import os, tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta
+from . import keys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -31,8 +32,22 @@ ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 
 # SECRET_KEYS
 SECRET_KEY = os.getenv("SECRET_KEY")
-PRIVATE_KEY = open(os.path.join(BASE_DIR, "private_key.pem")).read()
-PUBLIC_KEY = open(os.path.join(BASE_DIR, "public_key.pem")).read()
+PRIVATE_KEY_PATH = os.path.join(BASE_DIR, "private_key.pem")
+PUBLIC_KEY_PATH = os.path.join(BASE_DIR, "public_key.pem")
+
+# Parsed once here, so the token backend doesn't parse the PEM on every token
+PRIVATE_KEY = keys.load_private_key(PRIVATE_KEY_PATH)
+PUBLIC_KEY = keys.load_public_key(PUBLIC_KEY_PATH)
+
+# Token signing algorithm (RS256, ES256 or EdDSA), defaults to the one matching the private key
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM") or keys.key_algorithm(PRIVATE_KEY)
+
+# Public keys of retired signing keys (comma separated paths). Tokens signed
+# by them are still verified until they expire, then the paths can be removed.
+# The keys may use another algorithm, e.g. the RSA key while migrating to EdDSA.
+PREVIOUS_PUBLIC_KEY_PATHS = [
+    path.strip() for path in os.getenv("JWT_PREVIOUS_PUBLIC_KEYS", "").split(",") if path.strip()
+]
 
 # URLS
 HTTPS = os.getenv("HTTPS")
@@ -147,6 +162,36 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashers, new passwords are hashed with PASSWORD_HASHER (argon2, scrypt or pbkdf2).
+# Hashes made with another hasher or other costs are rehashed on the next successful login.
+# `manage.py tune_password_hasher` recommends the costs for a target verify time on this machine.
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "argon2")
+PASSWORD_HASHER_CLASSES = {
+    "argon2": "core_db.hashers.TunedArgon2PasswordHasher",
+    "scrypt": "core_db.hashers.TunedScryptPasswordHasher",
+    "pbkdf2": "core_db.hashers.TunedPBKDF2PasswordHasher",
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", 2))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", 64 * 1024)) # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", 1)) # Lanes, every hashing worker uses one core
+SCRYPT_WORK_FACTOR = int(os.getenv("SCRYPT_WORK_FACTOR", 2 ** 15))
+SCRYPT_BLOCK_SIZE = int(os.getenv("SCRYPT_BLOCK_SIZE", 8))
+SCRYPT_PARALLELISM = int(os.getenv("SCRYPT_PARALLELISM", 1))
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", 870000))
+
+# Passwords are hashed and verified in a process pool, so the hashing doesn't hold the GIL
+# of the request threads. Calls beyond WORKERS + QUEUE_DEPTH are refused with a 503.
+# Without workers (e.g. in tests) the hashing runs inline.
+# The pool is per process: with several WSGI/ASGI workers, keep the total of
+# WORKERS over all processes around the number of CPUs.
+PASSWORD_HASHING_WORKERS = 0 if TESTING else int(os.getenv("PASSWORD_HASHING_WORKERS", 2))
+PASSWORD_HASHING_QUEUE_DEPTH = int(os.getenv("PASSWORD_HASHING_QUEUE_DEPTH", 16))
+PASSWORD_HASHING_TIMEOUT = 10 # Seconds
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -272,8 +317,8 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5, seconds=10),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     
-     # Set the RS256 algorithm
-    "ALGORITHM": "RS256",
+    # Set the signing algorithm
+    "ALGORITHM": JWT_ALGORITHM,
     
     # Set the private key for signing the token
     "SIGNING_KEY": PRIVATE_KEY,
@@ -282,11 +327,36 @@ SIMPLE_JWT = {
     "VERIFYING_KEY": PUBLIC_KEY,
     
     # Token Settings
+    "AUTH_TOKEN_CLASSES": ("auth_api.tokens.UserAccessToken",),
     "USER_ID_CLAIM": "user_id",
+    "TOKEN_OBTAIN_SERIALIZER": "auth_api.serializers.UserTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "auth_api.serializers.UserTokenRefreshSerializer",
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
 }
 
+# Signing key and the verifying keys by kid, published at auth-api/.well-known/jwks.json
+JWT_KEYRING = keys.KeyRing(PRIVATE_KEY, PUBLIC_KEY, SIMPLE_JWT["ALGORITHM"])
+for path in PREVIOUS_PUBLIC_KEY_PATHS:
+    JWT_KEYRING.add_verifying_key(keys.load_public_key(path))
+
+# Expired refresh tokens are deleted by `manage.py prune_tokens`, schedule it with cron.
+# Set TOKEN_PRUNING_SCHEDULE=True to prune from the web processes instead, once per interval
+# whatever the number of processes.
+TOKEN_PRUNING_BATCH_SIZE = 1000 # Tokens deleted per transaction
+TOKEN_PRUNING_SLEEP = 0.1 # Seconds between batches
+TOKEN_PRUNING_SCHEDULE = os.getenv("TOKEN_PRUNING_SCHEDULE", "False") == "True"
+TOKEN_PRUNING_INTERVAL = 60 * 60 * 6 # 6 hours
+
+# Per process bloom filter of the blacklisted refresh tokens, only probable hits query the database.
+# Tokens blacklisted by another process are seen after at most MAX_STALENESS seconds.
+BLACKLIST_FILTER_MEMORY = 1024 * 1024 # 1 MiB, about 875k tokens at a 1% false positive rate
+BLACKLIST_FILTER_FALSE_POSITIVE_RATE = 0.01
+BLACKLIST_FILTER_MAX_STALENESS = 1 # Seconds
+
+# Threads running the token signing and mail calls of the async views
+ASYNC_VIEW_EXECUTOR_WORKERS = 8
+
 # CORS Settings
 
 CORS_ALLOWED_ORIGINS = [
@@ -323,6 +393,38 @@ SESSION_COOKIE_SECURE = True  # Secure session cookies
 # User Settings
 
 AUTH_USER_MODEL = 'core_db.User'
+USER_IMPORT_BATCH_SIZE = 1000 # Users validated and inserted together by `manage.py import_users`
+USER_EXPORT_CHUNK_SIZE = 2000 # Users fetched per round trip by the streaming export
+# Approximate user counts: planner estimates on PostgreSQL above the threshold, cached counts elsewhere
+USER_APPROXIMATE_COUNT_THRESHOLD = 10000
+USER_COUNT_CACHE_TIMEOUT = 60 # Seconds
+
+# Resolved user roles are cached per user and invalidated on group changes.
+# Bump the version to discard every cached role at once.
+USER_ROLE_CACHE_TIMEOUT = 60 * 60 # 1 hour
+USER_ROLE_CACHE_VERSION = 1
+
+# Cache Settings
+
+# OTPs, login sessions and throttles live in the cache, it must be shared by every worker.
+# A login session is one record (see auth_api.utils.LoginSession), one round-trip per write.
+# Without REDIS_URL (e.g. in tests) a per process local memory cache is used.
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "auth-api",
+        }
+    }
 
 # Media Settings
 
@@ -339,13 +441,30 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024
 # Email Settings
     
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
-# EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# EMAIL_BACKEND = 'auth_api.smtp.PooledSMTPBackend' # SMTP connections kept open between mails
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER')
 EMAIL_USE_TLS = True
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
+EMAIL_POOL_SIZE = 4 # Open SMTP connections per account, one per mail queue worker
+EMAIL_POOL_MAX_IDLE = 60 # Seconds before an idle connection is closed
+EMAIL_POOL_MAX_MESSAGES = 100 # Mails sent before a connection is renewed
+
+# Outbound mails are spooled and sent by a thread pool, the requests don't wait for SMTP.
+# `manage.py send_queued_mail` sends the mails left in the spool by a stopped process.
+if TESTING:
+    MAIL_SPOOL_DIR = os.path.join(tempfile.gettempdir(), 'test_mail_spool')
+else:
+    MAIL_SPOOL_DIR = os.getenv('MAIL_SPOOL_DIR', os.path.join(BASE_DIR, 'mail_spool'))
+MAIL_QUEUE_WORKERS = 4
+MAIL_QUEUE_EAGER = TESTING # Send within the request
+MAIL_MAX_ATTEMPTS = 5
+MAIL_BATCH_SIZE = 50 # Spooled mails sent over one connection
+MAIL_RETRY_BACKOFF = 10 # Seconds before the first retry, doubled after each failure
+MAIL_SEND_TIMEOUT = 5 * 60 # Mails sending for longer were abandoned by a stopped process
+MAIL_STATUS_TIMEOUT = 60 * 60 * 24 # 1 day
 
 # Security Settings
 MAX_LOGIN_FAILURE_LIMIT = 5
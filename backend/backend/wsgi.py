@@ -7,25 +7,15 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 """
 
-import os, threading, time
+import os
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
-from django.utils.timezone import now
-from rest_framework_simplejwt.tokens import OutstandingToken
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
 
-def cleanup_task():
-    """Thread function to clean up expired refresh tokens."""
-    while True:
-        expired_tokens = OutstandingToken.objects.filter(expires_at__lt=now())
-        count = expired_tokens.count()
-        expired_tokens.delete()
-        print(f"Deleted {count} expired refresh tokens")
-        
-        time.sleep(21600)  # Wait for 6 hours (21600 seconds)
-
-# Start background thread
-thread = threading.Thread(target=cleanup_task, daemon=True)
-thread.start()
+# Expired refresh tokens are pruned by `manage.py prune_tokens` unless scheduled in process
+if settings.TOKEN_PRUNING_SCHEDULE:
+    from auth_api.pruning import start_scheduler
+    start_scheduler()
@@ -0,0 +1,74 @@
+"""
+Password hashers with their cost parameters read from the settings.
+
+The algorithm names are the ones of the Django hashers, so existing hashes
+keep verifying. When a cost setting changes, `must_update` is true for the
+hashes made with the old cost and they are rehashed on the next login.
+"""
+import base64, hashlib
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+
+
+def scrypt_maxmem(work_factor, block_size, parallelism):
+    """Memory scrypt needs for the parameters, OpenSSL refuses more than 32 MiB by default."""
+    return 128 * block_size * (work_factor + parallelism + 2) + 1024 * 1024
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with the ARGON2_* settings"""
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """Scrypt with the SCRYPT_* settings"""
+
+    @property
+    def work_factor(self):
+        return settings.SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.SCRYPT_PARALLELISM
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        """Encode with enough memory allowed for the parameters of the hash"""
+        self._check_encode_args(password, salt)
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=n,
+            r=r,
+            p=p,
+            maxmem=scrypt_maxmem(n, r, p),
+            dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode("ascii").strip()
+        return "%s$%d$%s$%d$%d$%s" % (self.algorithm, n, salt, r, p, hash_)
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the PBKDF2_ITERATIONS setting"""
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
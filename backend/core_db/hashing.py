@@ -0,0 +1,113 @@
+"""
+Password hashing service.
+
+Hashing and verifying run the slow password hashers in a bounded process
+pool, so they don't hold the GIL of the worker serving other requests.
+At most `workers + queue_depth` calls are in flight, further calls are
+refused right away with `HashingUnavailable` (503) instead of queueing up.
+"""
+import asyncio, os, threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingUnavailable(APIException):
+    """Raised when the hashing pool is saturated."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Server is busy, try again later."
+    default_code = "hashing_unavailable"
+    wait = 1 # Sent as Retry-After
+
+def setup_worker():
+    """Process pool initializer, spawned workers load the settings themselves."""
+    if not settings.configured or not django.apps.apps.ready:
+        django.setup()
+
+class HashingService:
+    """Runs make_password and verify_password in a bounded process pool."""
+
+    def __init__(self, workers=None, queue_depth=None, timeout=None):
+        self.workers = settings.PASSWORD_HASHING_WORKERS if workers is None else workers
+        self.queue_depth = settings.PASSWORD_HASHING_QUEUE_DEPTH if queue_depth is None else queue_depth
+        self.timeout = timeout or settings.PASSWORD_HASHING_TIMEOUT
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_depth)
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=setup_worker)
+            return self._executor
+
+    def reset_executor(self):
+        """Drop the process pool, e.g. in a forked child where its processes aren't ours."""
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_depth)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def submit(self, func, *args):
+        """Submit the call to the pool, raises HashingUnavailable when every slot is taken."""
+        if not self._slots.acquire(blocking=False):
+            raise HashingUnavailable()
+
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, func, *args):
+        # Without workers (e.g. in tests) the hashing runs inline
+        if not self.workers:
+            return func(*args)
+
+        try:
+            return self.submit(func, *args).result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingUnavailable()
+
+    async def arun(self, func, *args):
+        if not self.workers:
+            return func(*args)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self.submit(func, *args)), self.timeout)
+        except asyncio.TimeoutError:
+            raise HashingUnavailable()
+
+    def make_password(self, password):
+        """Hash the password with the preferred hasher."""
+        return self.run(make_password, password)
+
+    def verify_password(self, password, encoded):
+        """Return if the password matches and if its hash must be updated."""
+        return self.run(verify_password, password, encoded)
+
+    async def amake_password(self, password):
+        return await self.arun(make_password, password)
+
+    async def averify_password(self, password, encoded):
+        return await self.arun(verify_password, password, encoded)
+
+    def stats(self):
+        """In flight calls of the pool, for monitoring."""
+        capacity = self.workers + self.queue_depth
+        return {"workers": self.workers, "capacity": capacity, "in_flight": capacity - self._slots._value}
+
+hashing_service = HashingService()
+os.register_at_fork(after_in_child=hashing_service.reset_executor)
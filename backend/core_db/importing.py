@@ -0,0 +1,211 @@
+"""
+Bulk user import.
+
+Users are streamed from CSV or JSONL and written per batch. The rows of a
+batch are checked against the existing users with one query per unique
+field, the passwords are hashed in a process pool and the users and their
+group links are written with bulk_create, without the per row validation
+queries and signals of `User.save`. Invalid rows are reported and skipped,
+the rest of their batch is still imported.
+"""
+import csv, itertools, json
+from concurrent.futures import ProcessPoolExecutor
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
+from django.utils.timezone import now
+from .hashing import setup_worker
+from .models import User
+from .roles import invalidate_user_roles
+
+
+FIELDS = (
+    "email", "password", "username", "first_name", "last_name", "phone_number",
+    "is_active", "is_staff", "is_email_verified", "is_phone_verified", "auth_provider",
+)
+BOOLEAN_FIELDS = ("is_active", "is_staff", "is_email_verified", "is_phone_verified")
+UNIQUE_FIELDS = ("email", "username", "phone_number", "slug")
+
+
+def read_rows(stream, format):
+    """Yield the line number, the fields and the parse error of each row."""
+    if format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, "Invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, row, None
+
+def parse_boolean(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+class UserImporter:
+    """Imports rows as users in batches, reporting the rows that failed."""
+
+    def __init__(self, batch_size=1000, workers=0, hashed=False, on_error=None):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.hashed = hashed
+        self.on_error = on_error or (lambda line_number, message: None)
+        self.imported = 0
+        self.failed = 0
+        self._group_ids = {}
+        self._executor = None
+
+    def fail(self, line_number, message):
+        self.failed += 1
+        self.on_error(line_number, message)
+
+    def group_id(self, user):
+        """Id of the group the user is linked to, like the post_save receiver does."""
+        name = "Admin" if user.is_staff else "Default"
+        if name not in self._group_ids:
+            self._group_ids[name] = Group.objects.get_or_create(name=name)[0].pk
+        return self._group_ids[name]
+
+    def build_user(self, row):
+        """Return the validated unsaved user of the row and its password."""
+        fields = {}
+        for name in FIELDS:
+            value = row.get(name)
+            if isinstance(value, str):
+                value = value.strip()
+            if value not in (None, ""):
+                fields[name] = parse_boolean(value) if name in BOOLEAN_FIELDS else value
+
+        email = fields.pop("email", None)
+        if not email:
+            raise ValidationError("Email is required")
+        validate_email(email)
+
+        password = fields.pop("password", None)
+        user = User(email=User.objects.normalize_email(email), **fields)
+        user.username = user.username or user.email
+        user.slug = slugify(user.username)
+        user.last_failed_login_time = now()
+        user.full_clean(exclude=["password"], validate_unique=False, validate_constraints=False)
+
+        if self.hashed:
+            try:
+                identify_hasher(password or "")
+            except ValueError:
+                raise ValidationError("Unknown password hash")
+            user.password = password
+            password = None
+        else:
+            user._pass_valid(password)
+
+        return user, password
+
+    def drop_duplicates(self, candidates):
+        """Keep the users whose unique fields are not taken, by the database or earlier rows."""
+        taken = {}
+        for field in UNIQUE_FIELDS:
+            values = [getattr(user, field) for _, user, _ in candidates if getattr(user, field)]
+            existing = User.objects.filter(**{f"{field}__in": values}).values_list(field, flat=True)
+            taken[field] = {str(value) for value in existing}
+
+        unique = []
+        for line_number, user, password in candidates:
+            duplicate = next(
+                (field for field in UNIQUE_FIELDS if getattr(user, field) and str(getattr(user, field)) in taken[field]),
+                None
+            )
+            if duplicate:
+                self.fail(line_number, f"User with this {duplicate.replace('_', ' ')} already exists")
+                continue
+
+            for field in UNIQUE_FIELDS:
+                if getattr(user, field):
+                    taken[field].add(str(getattr(user, field)))
+            unique.append((line_number, user, password))
+
+        return unique
+
+    def hash_passwords(self, passwords):
+        """Hash the raw passwords, in the process pool when there are workers. None is unusable."""
+        if not self.workers:
+            return [make_password(password) for password in passwords]
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=setup_worker)
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._executor.map(make_password, passwords, chunksize=chunksize))
+
+    def write(self, users):
+        """Insert the users and their group links."""
+        with transaction.atomic():
+            created = User.objects.bulk_create(users)
+            if any(user.pk is None for user in created):
+                # The backend doesn't return the ids of bulk inserts
+                ids = dict(User.objects.filter(email__in=[user.email for user in created]).values_list("email", "pk"))
+                for user in created:
+                    user.pk = ids[user.email]
+
+            User.groups.through.objects.bulk_create([
+                User.groups.through(user_id=user.pk, group_id=self.group_id(user)) for user in created
+            ])
+
+        invalidate_user_roles([user.pk for user in created])
+
+    def import_batch(self, rows):
+        candidates = []
+        for line_number, row, error in rows:
+            if error:
+                self.fail(line_number, error)
+                continue
+            try:
+                user, password = self.build_user(row)
+            except ValidationError as e:
+                self.fail(line_number, "; ".join(e.messages))
+                continue
+            candidates.append((line_number, user, password))
+
+        candidates = self.drop_duplicates(candidates)
+        if not self.hashed:
+            hashes = self.hash_passwords([password for _, _, password in candidates])
+            for (_, user, _), encoded in zip(candidates, hashes):
+                user.password = encoded
+
+        try:
+            self.write([user for _, user, _ in candidates])
+            self.imported += len(candidates)
+        except IntegrityError:
+            # A user was created concurrently, write the rows one by one
+            for line_number, user, _ in candidates:
+                user.pk = None
+                try:
+                    self.write([user])
+                    self.imported += 1
+                except IntegrityError as e:
+                    self.fail(line_number, str(e))
+
+    def run(self, rows):
+        """Import the rows, returns the number of imported and failed rows."""
+        rows = iter(rows)
+        try:
+            while batch := list(itertools.islice(rows, self.batch_size)):
+                self.import_batch(batch)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+        return self.imported, self.failed
@@ -0,0 +1,25 @@
+"""Database indexes of the core models"""
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
+
+
+class TrigramIndex(GinIndex):
+    """
+    GIN trigram index, PostgreSQL only.
+    Other databases (e.g. SQLite in tests) skip it and run the search unindexed.
+    """
+
+    @classmethod
+    def upper(cls, field, name):
+        """Index of UPPER(field), the expression compared by icontains and istartswith."""
+        return cls(OpClass(Upper(field), name='gin_trgm_ops'), name=name)
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return ""
+        return super().create_sql(model, schema_editor, using, **kwargs)
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return ""
+        return super().remove_sql(model, schema_editor, **kwargs)
@@ -0,0 +1,56 @@
+"""Django command to import users in bulk from CSV or JSONL"""
+import os, time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core_db.importing import UserImporter, read_rows
+
+
+class Command(BaseCommand):
+    """
+    Django command importing users from a CSV file with a header row or a
+    JSONL file with one object per line, with the columns of `core_db.importing.FIELDS`.
+    Rows that fail validation are reported with their line and skipped.
+    """
+    help = "Import users in batches from a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file")
+        parser.add_argument("--format", choices=("csv", "jsonl"), help="Defaults to the file extension")
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.USER_IMPORT_BATCH_SIZE,
+            help="Number of users validated and inserted together"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=settings.PASSWORD_HASHING_WORKERS,
+            help="Processes hashing the passwords, 0 hashes inline"
+        )
+        parser.add_argument(
+            "--hashed", action="store_true",
+            help="The password column holds Django password hashes, e.g. exported from another instance"
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if format not in ("csv", "jsonl"):
+            raise CommandError("Unknown format, pass --format csv or --format jsonl")
+
+        importer = UserImporter(
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            hashed=options["hashed"],
+            on_error=lambda line_number, message: self.stderr.write(f"Line {line_number}: {message}"),
+        )
+
+        start = time.perf_counter()
+        try:
+            with open(path, newline="", encoding="utf-8") as stream:
+                imported, failed = importer.run(read_rows(stream, format))
+        except OSError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        rate = (imported + failed) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} users, {failed} rows failed in {elapsed:.2f}s ({rate:.0f} rows/s)"
+        ))
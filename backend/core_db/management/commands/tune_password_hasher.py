@@ -0,0 +1,104 @@
+"""Django command to recommend password hasher costs for a target verify time"""
+import hashlib, os, statistics, time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core_db.hashers import scrypt_maxmem
+
+
+PASSWORD = b"TestP@ssw0rd"
+SALT = os.urandom(16)
+
+
+def argon2_verifier(time_cost, memory_cost):
+    """Verify with argon2id on a single lane, every hashing worker uses one core"""
+    from argon2 import PasswordHasher
+    hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=1)
+    encoded = hasher.hash(PASSWORD)
+    return lambda: hasher.verify(encoded, PASSWORD)
+
+def scrypt_verifier(work_factor, block_size):
+    maxmem = scrypt_maxmem(work_factor, block_size, 1)
+    return lambda: hashlib.scrypt(PASSWORD, salt=SALT, n=work_factor, r=block_size, p=1, maxmem=maxmem, dklen=64)
+
+def pbkdf2_verifier(iterations):
+    return lambda: hashlib.pbkdf2_hmac("sha256", PASSWORD, SALT, iterations)
+
+class Command(BaseCommand):
+    """
+    Django command benchmarking a password hasher on this machine and
+    recommending the costs whose verify time on one core is the closest
+    to the target without exceeding it.
+    """
+    help = "Recommend password hasher costs for a target verify time per core."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hasher", choices=settings.PASSWORD_HASHER_CLASSES, default=settings.PASSWORD_HASHER)
+        parser.add_argument("--target-ms", type=float, default=50, help="Target verify time in milliseconds")
+        parser.add_argument("--memory", type=int, default=settings.ARGON2_MEMORY_COST, help="Argon2 memory cost in KiB")
+        parser.add_argument("--rounds", type=int, default=5, help="Verifications timed per candidate")
+
+    def measure(self, verify, rounds):
+        """Median verify time in milliseconds"""
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            verify()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def tune_argon2(self, target, memory, rounds):
+        """Raise the time cost while under the target, lower the memory if one pass is already over"""
+        while memory > 8 * 1024 and self.measure(argon2_verifier(1, memory), rounds) > target:
+            memory //= 2
+            self.stdout.write(f"  one pass over the target, memory_cost lowered to {memory} KiB")
+
+        best, time_cost = (1, memory), 1
+        while True:
+            elapsed = self.measure(argon2_verifier(time_cost, memory), rounds)
+            self.stdout.write(f"  time_cost={time_cost} memory_cost={memory} KiB: {elapsed:.1f} ms")
+            if elapsed > target:
+                break
+            best, time_cost = (time_cost, memory), time_cost + 1
+
+        time_cost, memory = best
+        return {"ARGON2_TIME_COST": time_cost, "ARGON2_MEMORY_COST": memory, "ARGON2_PARALLELISM": 1}
+
+    def tune_scrypt(self, target, rounds):
+        """Double the work factor while under the target"""
+        block_size = settings.SCRYPT_BLOCK_SIZE
+        best, work_factor = 2 ** 14, 2 ** 14
+        while True:
+            elapsed = self.measure(scrypt_verifier(work_factor, block_size), rounds)
+            self.stdout.write(f"  work_factor=2**{work_factor.bit_length() - 1} block_size={block_size}: {elapsed:.1f} ms")
+            if elapsed > target:
+                break
+            best, work_factor = work_factor, work_factor * 2
+
+        return {"SCRYPT_WORK_FACTOR": best, "SCRYPT_BLOCK_SIZE": block_size, "SCRYPT_PARALLELISM": 1}
+
+    def tune_pbkdf2(self, target, rounds):
+        """The time is linear in the iterations, scale a sample run"""
+        sample = 100000
+        elapsed = self.measure(pbkdf2_verifier(sample), rounds)
+        self.stdout.write(f"  iterations={sample}: {elapsed:.1f} ms")
+        iterations = max(10000, int(sample * target / elapsed) // 10000 * 10000)
+
+        return {"PBKDF2_ITERATIONS": iterations}
+
+    def handle(self, *args, **options):
+        hasher, target, rounds = options["hasher"], options["target_ms"], options["rounds"]
+        if target <= 0:
+            raise CommandError("--target-ms must be positive")
+
+        self.stdout.write(f"Tuning {hasher} for {target:g} ms per verify")
+        if hasher == "argon2":
+            recommended = self.tune_argon2(target, options["memory"], rounds)
+        elif hasher == "scrypt":
+            recommended = self.tune_scrypt(target, rounds)
+        else:
+            recommended = self.tune_pbkdf2(target, rounds)
+
+        self.stdout.write(self.style.SUCCESS("Recommended environment:"))
+        self.stdout.write(f"PASSWORD_HASHER={hasher}")
+        for name, value in recommended.items():
+            self.stdout.write(f"{name}={value}")
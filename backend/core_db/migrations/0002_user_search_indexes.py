@@ -0,0 +1,39 @@
+# Trigram indexes for the user search, PostgreSQL only
+
+import core_db.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations
+
+
+class AddPostgresIndexConcurrently(AddIndexConcurrently):
+    """Build the index without locking the table on PostgreSQL, other databases only record it"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    # CONCURRENTLY doesn't lock the table while the index builds, it can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('core_db', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddPostgresIndexConcurrently(
+            model_name='user',
+            index=core_db.indexes.TrigramIndex.upper('email', name='core_db_user_email_trgm'),
+        ),
+        AddPostgresIndexConcurrently(
+            model_name='user',
+            index=core_db.indexes.TrigramIndex.upper('username', name='core_db_user_username_trgm'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core_db', '0002_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_active', 'email'], name='core_db_user_active_email_idx'),
+        ),
+    ]
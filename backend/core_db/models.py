@@ -1,6 +1,8 @@
 """JWT User Model"""
 import re, secrets, string
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.lookups import Exact
 from django.contrib.auth.models import (
     BaseUserManager,
     AbstractBaseUser,
@@ -9,6 +11,10 @@ from django.contrib.auth.models import (
 from phonenumber_field.modelfields import PhoneNumberField
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email, RegexValidator
+from django.utils.text import slugify
+from django.utils.timezone import now
+from .hashing import hashing_service
+from .indexes import TrigramIndex
 
 
 class UserManager(BaseUserManager):
@@ -32,6 +38,32 @@ class UserManager(BaseUserManager):
             
         return user
     
+    def record_failed_login(self, pk, window, limit):
+        """
+        Count a failed login with one UPDATE, without the validation and signals of save().
+        The count restarts when the last failure is older than the window and the
+        account is locked when it reaches the limit. Returns the new count.
+        """
+        current = now()
+        attempts = Case(
+            When(last_failed_login_time__gte=current - window, then=F("failed_login_attempts") + 1),
+            default=Value(1),
+        )
+        locked = Exact(attempts, limit)
+
+        with transaction.atomic():
+            self.filter(pk=pk).update(
+                failed_login_attempts=attempts,
+                last_failed_login_time=current,
+                # Superusers lose the email verification, other users are deactivated
+                is_active=Case(When(Q(locked, is_superuser=False), then=Value(False)), default=F("is_active")),
+                is_email_verified=Case(
+                    When(Q(locked, is_superuser=True), then=Value(False)), default=F("is_email_verified")
+                ),
+            )
+            # The row stays locked by the update, so this reads our count
+            return self.filter(pk=pk).values_list("failed_login_attempts", flat=True).first()
+
     def create_superuser(self, email, password, **extra_fields):
         """Super User Creation"""
         if not password:
@@ -54,6 +86,13 @@ class User(AbstractBaseUser, PermissionsMixin):
     """Custom User Class"""
     class Meta:
         ordering = ['email']
+        indexes = [
+            # Users list filtered on is_active, in email order without a sort
+            models.Index(fields=['is_active', 'email'], name='core_db_user_active_email_idx'),
+            # User search, see auth_api.search
+            TrigramIndex.upper('email', name='core_db_user_email_trgm'),
+            TrigramIndex.upper('username', name='core_db_user_username_trgm'),
+        ]
     
     AUTH_PROVIDER = [
         ('email', 'Email'),
@@ -141,13 +180,55 @@ class User(AbstractBaseUser, PermissionsMixin):
         return ''.join(password)
     
     def set_password(self, raw_password):
-        """Validates raw password before hashing"""
+        """Validates raw password before hashing it in the hashing pool"""
         self._pass_valid(raw_password)
-        super().set_password(raw_password)
+        self.password = hashing_service.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """Verify the password in the hashing pool, rehashing it when the hasher changed"""
+        is_correct, must_update = hashing_service.verify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.password = hashing_service.make_password(raw_password)
+            self._password = None
+            self.save(update_fields=["password"])
+
+        return is_correct
+
+    async def acheck_password(self, raw_password):
+        """See check_password()"""
+        is_correct, must_update = await hashing_service.averify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.password = await hashing_service.amake_password(raw_password)
+            self._password = None
+            await self.asave(update_fields=["password"])
+
+        return is_correct
 
     def save(self, *args, **kwargs):
-        """Running Validators before saving"""
-        self.full_clean()
+        """
+        Set the username and slug defaults then run the validators before saving.
+        With update_fields only the updated fields are validated, so internal
+        updates don't run the unique checks of the fields they don't change.
+        """
+        if not self.username:
+            self.username = self.email
+        # Set before the validation, so a slug taken by another user is a ValidationError
+        self.slug = slugify(self.username)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "username" in update_fields:
+            # The slug follows the username
+            update_fields = kwargs["update_fields"] = {*update_fields, "slug"}
+
+        if update_fields is None:
+            self.full_clean()
+        elif update_fields:
+            update_fields = set(update_fields)
+            self.full_clean(exclude=[
+                field.name for field in self._meta.concrete_fields
+                if field.name not in update_fields and field.attname not in update_fields
+            ])
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -0,0 +1,44 @@
+"""User role resolution backed by the group memberships"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Groups that map to a role, in order of precedence
+ROLE_PRECEDENCE = ('Default', 'Admin', 'Superuser')
+UNAUTHORIZED_ROLE = 'UnAuthorized'
+
+
+def _role_cache_key(user_id):
+    """Cache key holding the resolved role of a user"""
+    return f"user_role_{user_id}"
+
+def resolve_role(group_names):
+    """Pick the role with the highest precedence from the given group names."""
+    group_names = set(group_names)
+    for role in ROLE_PRECEDENCE:
+        if role in group_names:
+            return role
+
+    return UNAUTHORIZED_ROLE
+
+def get_user_role(user):
+    """
+    Get user role.
+    The role is read from the cache and only resolved with a single query
+    on the user's role groups when it is missing.
+    """
+    key = _role_cache_key(user.pk)
+    role = cache.get(key, version=settings.USER_ROLE_CACHE_VERSION)
+
+    if role is None:
+        group_names = user.groups.filter(name__in=ROLE_PRECEDENCE).values_list('name', flat=True)
+        role = resolve_role(group_names)
+        cache.set(key, role, timeout=settings.USER_ROLE_CACHE_TIMEOUT, version=settings.USER_ROLE_CACHE_VERSION)
+
+    return role
+
+def invalidate_user_roles(user_ids):
+    """Drop the cached role of the given users."""
+    keys = [_role_cache_key(user_id) for user_id in user_ids]
+    if keys:
+        cache.delete_many(keys, version=settings.USER_ROLE_CACHE_VERSION)
@@ -1,42 +1,57 @@
 """Signals used before or after saving a model"""
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.contrib.auth.models import Group
 from django.dispatch import receiver
-from django.utils.text import slugify
 from django.utils.timezone import now
 from .models import User
+from .roles import invalidate_user_roles
 
 
 @receiver(pre_save, sender=User)
-def set_user_username(sender, instance, **kwargs):
-    """Set unique username if not provided"""
-    if not instance.username:
-        instance.username = instance.email
-
-@receiver(post_save, sender=User)
-def save_user_slug(sender, instance, created, **kwargs):
-    """Create slug for user using username"""
-    if created or (slugify(instance.username) != instance.slug):
-        instance.slug = slugify(instance.username)
-        instance.save()
-        
-@receiver(post_save, sender=User)
-def save_user_last_failed_login_time(sender, instance, created, **kwargs):
-    if created:
-        instance.last_failed_login_time = now()
-        instance.save()
+def set_user_defaults(sender, instance, **kwargs):
+    """Set the defaults of a new user before it is written, see User.save() for the username and slug"""
+    if instance._state.adding:
+        if not instance.last_failed_login_time:
+            instance.last_failed_login_time = now()
+        if instance.is_superuser and not instance.profile_img:
+            instance.profile_img = 'profile_images/default_profile.jpg'
 
 @receiver(post_save, sender=User)
 def set_user_default_group(sender, instance, created, **kwargs):
-    if created and instance.pk:
+    """Link a new user to the group of their role with one insert"""
+    if created:
         if instance.is_superuser:
-            instance.profile_img = 'profile_images/default_profile.jpg'
-            admin_group, _ = Group.objects.get_or_create(name="Superuser")
-            instance.groups.add(admin_group)
-            instance.save()
+            group_name = "Superuser"
         elif instance.is_staff:
-            admin_group, _ = Group.objects.get_or_create(name="Admin")
-            instance.groups.add(admin_group)
+            group_name = "Admin"
         else:
-            default_group, _ = Group.objects.get_or_create(name="Default")
-            instance.groups.add(default_group)
\ No newline at end of file
+            group_name = "Default"
+
+        group, _ = Group.objects.get_or_create(name=group_name)
+        User.groups.through.objects.create(user_id=instance.pk, group_id=group.pk)
+        # The link is inserted without m2m_changed, drop a role cached for a reused id
+        invalidate_user_roles([instance.pk])
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_role_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop the cached role when group memberships change"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_user_roles([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        invalidate_user_roles(pk_set)
+    elif action == 'pre_clear':
+        # Members are no longer known once the group is cleared
+        invalidate_user_roles(instance.user_set.values_list('pk', flat=True))
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_role_on_group_update(sender, instance, **kwargs):
+    """Drop the cached role of the members when a group is renamed or deleted"""
+    if not kwargs.get('created'):
+        invalidate_user_roles(instance.user_set.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=User)
+def invalidate_role_on_user_delete(sender, instance, **kwargs):
+    """Drop the cached role of a deleted user"""
+    invalidate_user_roles([instance.pk])
@@ -0,0 +1,72 @@
+"""Test Cases for the Tuned Password Hashers"""
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+
+PBKDF2_FIRST = [
+    'core_db.hashers.TunedPBKDF2PasswordHasher',
+    'core_db.hashers.TunedArgon2PasswordHasher',
+]
+ARGON2_FIRST = list(reversed(PBKDF2_FIRST))
+SCRYPT_FIRST = ['core_db.hashers.TunedScryptPasswordHasher'] + PBKDF2_FIRST
+
+
+class PasswordRehashTests(TestCase):
+    """Test the hashes are upgraded on a successful password check"""
+
+    def create_user(self):
+        return get_user_model().objects.create_user(email='test@example.com', password='Django@123')
+
+    def test_rehash_with_preferred_hasher(self):
+        """Test a hash of another hasher is rehashed with the preferred one"""
+        with override_settings(PASSWORD_HASHERS=PBKDF2_FIRST):
+            user = self.create_user()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+
+        with override_settings(PASSWORD_HASHERS=ARGON2_FIRST):
+            self.assertTrue(user.check_password('Django@123'))
+
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$argon2id$'))
+        self.assertTrue(user.check_password('Django@123'))
+
+    @override_settings(PASSWORD_HASHERS=ARGON2_FIRST, ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=8 * 1024)
+    def test_rehash_on_cost_change(self):
+        """Test a hash made with other costs is rehashed with the current costs"""
+        user = self.create_user()
+        self.assertIn('m=8192,t=1,p=1', user.password)
+
+        with self.settings(ARGON2_TIME_COST=2):
+            self.assertTrue(user.check_password('Django@123'))
+
+        user.refresh_from_db()
+        self.assertIn('m=8192,t=2,p=1', user.password)
+
+    @override_settings(PASSWORD_HASHERS=SCRYPT_FIRST, SCRYPT_WORK_FACTOR=2 ** 15)
+    def test_scrypt_above_default_memory_limit(self):
+        """Test scrypt work factors needing over 32 MiB still hash and verify"""
+        user = self.create_user()
+
+        self.assertTrue(user.password.startswith('scrypt$32768$'))
+        self.assertTrue(user.check_password('Django@123'))
+
+class TunePasswordHasherCommandTests(TestCase):
+    """Test the tune_password_hasher command"""
+
+    def test_recommends_pbkdf2_iterations(self):
+        """Test the command recommends the costs as environment variables"""
+        out = StringIO()
+        call_command('tune_password_hasher', hasher='pbkdf2', target_ms=5, rounds=1, stdout=out)
+
+        self.assertIn('PASSWORD_HASHER=pbkdf2', out.getvalue())
+        self.assertRegex(out.getvalue(), r'PBKDF2_ITERATIONS=\d+0000')
+
+    def test_recommends_argon2_costs(self):
+        """Test argon2 is tuned on a single lane"""
+        out = StringIO()
+        call_command('tune_password_hasher', hasher='argon2', target_ms=1, memory=8 * 1024, rounds=1, stdout=out)
+
+        self.assertIn('ARGON2_TIME_COST=1', out.getvalue())
+        self.assertIn('ARGON2_PARALLELISM=1', out.getvalue())
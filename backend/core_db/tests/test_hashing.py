@@ -0,0 +1,81 @@
+"""Test Cases for the Password Hashing Service"""
+import time
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from core_db.hashing import HashingService, HashingUnavailable
+
+
+class HashingServiceTests(SimpleTestCase):
+    """Test the process pool hashing service"""
+
+    def setUp(self):
+        self.service = HashingService(workers=1, queue_depth=1)
+
+    def tearDown(self):
+        self.service.shutdown()
+
+    def test_hash_and_verify_in_pool(self):
+        """Test passwords are hashed and verified in the process pool"""
+        encoded = self.service.make_password('TestP@ssw0rd')
+
+        self.assertTrue(check_password('TestP@ssw0rd', encoded))
+        self.assertEqual(self.service.verify_password('TestP@ssw0rd', encoded), (True, False))
+        self.assertEqual(self.service.verify_password('wrong', encoded), (False, False))
+
+    async def test_async_verify_in_pool(self):
+        """Test the async calls wait on the pool without blocking the event loop"""
+        encoded = await self.service.amake_password('TestP@ssw0rd')
+
+        self.assertEqual(await self.service.averify_password('TestP@ssw0rd', encoded), (True, False))
+
+    def test_saturated_pool_refused(self):
+        """Test calls beyond the workers and queue depth are refused right away"""
+        futures = [self.service.submit(time.sleep, 0.5) for _ in range(2)]
+
+        start = time.perf_counter()
+        with self.assertRaises(HashingUnavailable):
+            self.service.make_password('TestP@ssw0rd')
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertEqual(self.service.stats()['in_flight'], 2)
+
+        for future in futures:
+            future.result()
+
+    def test_inline_without_workers(self):
+        """Test the hashing runs inline without workers"""
+        service = HashingService(workers=0)
+        encoded = service.make_password('TestP@ssw0rd')
+
+        self.assertIsNone(service._executor)
+        self.assertEqual(service.verify_password('TestP@ssw0rd', encoded), (True, False))
+
+class UserPasswordRehashTests(TestCase):
+    """Test the password is only rehashed after a successful check"""
+
+    def setUp(self):
+        with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']):
+            self.user = get_user_model().objects.create_user(email='test@example.com', password='Django@123')
+
+    def test_rehash_on_correct_password(self):
+        """Test an outdated hash is upgraded by a correct password"""
+        self.assertTrue(self.user.check_password('Django@123'))
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.password.startswith('pbkdf2_sha1$'))
+        self.assertTrue(self.user.check_password('Django@123'))
+
+    def test_no_rehash_on_wrong_password(self):
+        """Test a wrong password doesn't replace an outdated hash"""
+        self.assertFalse(self.user.check_password('Wrong@123'))
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha1$'))
+        self.assertTrue(self.user.check_password('Django@123'))
+
+    async def test_no_rehash_on_wrong_password_async(self):
+        """Test the async check doesn't replace an outdated hash with a wrong password"""
+        self.assertFalse(await self.user.acheck_password('Wrong@123'))
+
+        await self.user.arefresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha1$'))
@@ -0,0 +1,106 @@
+"""Test Cases for the Bulk User Import"""
+import json, os, tempfile
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class ImportUsersCommandTests(TestCase):
+    """Test the import_users command"""
+
+    def setUp(self):
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            os.remove(path)
+
+    def write_file(self, suffix, content):
+        """Write the content to a temporary file and return its path"""
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w') as file:
+            file.write(content)
+        self.paths.append(path)
+        return path
+
+    def import_users(self, path, **options):
+        """Run the command and return its output and errors"""
+        out, err = StringIO(), StringIO()
+        call_command('import_users', path, stdout=out, stderr=err, workers=0, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_csv(self):
+        """Test users are imported with their slug, group and hashed password"""
+        path = self.write_file('.csv', (
+            "email,password,first_name,is_staff\n"
+            "one@example.com,Django@123,One,\n"
+            "two@example.com,Django@123,Two,true\n"
+        ))
+
+        out, err = self.import_users(path)
+
+        self.assertIn("Imported 2 users, 0 rows failed", out)
+        self.assertEqual(err, "")
+        one = get_user_model().objects.get(email='one@example.com')
+        self.assertEqual(one.username, 'one@example.com')
+        self.assertEqual(one.slug, 'oneexamplecom')
+        self.assertTrue(one.check_password('Django@123'))
+        self.assertIsNotNone(one.last_failed_login_time)
+        self.assertEqual(list(one.groups.values_list('name', flat=True)), ['Default'])
+        two = get_user_model().objects.get(email='two@example.com')
+        self.assertEqual(list(two.groups.values_list('name', flat=True)), ['Admin'])
+
+    def test_invalid_rows_reported_without_aborting_batch(self):
+        """Test invalid and duplicate rows are reported and the other rows imported"""
+        get_user_model().objects.create_user(email='taken@example.com', password='Django@123')
+        path = self.write_file('.jsonl', "\n".join([
+            json.dumps({"email": "valid@example.com", "password": "Django@123"}),
+            json.dumps({"email": "taken@example.com", "password": "Django@123"}),
+            json.dumps({"email": "not-an-email", "password": "Django@123"}),
+            json.dumps({"email": "weak@example.com", "password": "weak"}),
+            "{not json",
+            json.dumps({"email": "valid@example.com", "password": "Django@123"}),
+        ]))
+
+        out, err = self.import_users(path)
+
+        self.assertIn("Imported 1 users, 5 rows failed", out)
+        self.assertIn("Line 2: User with this email already exists", err)
+        self.assertIn("Line 3: Enter a valid email address.", err)
+        self.assertIn("Line 4: Password must contain", err)
+        self.assertIn("Line 5: Invalid JSON", err)
+        self.assertIn("Line 6: User with this email already exists", err)
+        self.assertTrue(get_user_model().objects.filter(email='valid@example.com').exists())
+
+    def test_import_prehashed_passwords(self):
+        """Test password hashes are imported as is with --hashed"""
+        encoded = make_password('Django@123')
+        path = self.write_file('.jsonl', "\n".join([
+            json.dumps({"email": "hashed@example.com", "password": encoded}),
+            json.dumps({"email": "raw@example.com", "password": "Django@123"}),
+        ]))
+
+        out, err = self.import_users(path, hashed=True)
+
+        self.assertIn("Imported 1 users, 1 rows failed", out)
+        self.assertIn("Line 2: Unknown password hash", err)
+        user = get_user_model().objects.get(email='hashed@example.com')
+        self.assertEqual(user.password, encoded)
+
+    def test_batch_written_with_bulk_inserts(self):
+        """Test a batch is one user insert and one group link insert"""
+        Group.objects.get_or_create(name="Default")
+        rows = [json.dumps({"email": f"user{i}@example.com", "password": make_password('Django@123')}) for i in range(20)]
+        path = self.write_file('.jsonl', "\n".join(rows))
+
+        with CaptureQueriesContext(connection) as queries:
+            out, _ = self.import_users(path, hashed=True, batch_size=10)
+
+        self.assertIn("Imported 20 users", out)
+        inserts = [query['sql'].split()[2] for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(inserts, ['"core_db_user"', '"core_db_user_groups"'] * 2)
@@ -1,7 +1,9 @@
 """Test Cases for User"""
 import os, io
 from django.conf import settings
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.core.exceptions  import ValidationError
@@ -25,7 +27,7 @@ class UserModelTests(TestCase):
         self.assertEqual(user.email, email)
         self.assertTrue(user.check_password(password))
         self.assertTrue(user.is_active)
-        self.assertEqual(user.username, email) # checking if username signal is working
+        self.assertEqual(user.username, email) # checking if username default is working
         self.assertEqual(user.is_email_verified, False) # checking if email verified is false
         self.assertEqual(user.is_phone_verified, False) # checking if phone verified is false
         self.assertEqual(user.failed_login_attempts, 0) # checking if failed login attempts is 0
@@ -45,9 +47,56 @@ class UserModelTests(TestCase):
         self.assertEqual(user.email, email)
         self.assertTrue(user.check_password(password))
         self.assertTrue(user.is_active)
-        self.assertEqual(user.username, email) # checking if username signal is working
+        self.assertEqual(user.username, email) # checking if username default is working
         self.assertIn(admin_group, user.groups.all()) # checking if group signal is working
 
+    def test_creating_user_inserts_once(self):
+        """Test a signup is one user insert and one group link insert"""
+        Group.objects.get_or_create(name="Default")
+
+        with CaptureQueriesContext(connection) as queries:
+            user = get_user_model().objects.create_user(email='test@example.com', password='Django@123')
+
+        sql = [query['sql'] for query in queries]
+        self.assertEqual(len(sql), 6) # Email, username and slug unique checks, user insert, group lookup, group link insert
+        self.assertEqual([query.split()[:3] for query in sql if query.startswith('INSERT')], [
+            ['INSERT', 'INTO', '"core_db_user"'],
+            ['INSERT', 'INTO', '"core_db_user_groups"'],
+        ])
+        user.refresh_from_db()
+        self.assertEqual(user.slug, 'testexamplecom')
+        self.assertIsNotNone(user.last_failed_login_time)
+        self.assertEqual(list(user.groups.values_list('name', flat=True)), ['Default'])
+
+    def test_creating_superuser_sets_defaults_before_insert(self):
+        """Test the superuser group and profile image are set without another save"""
+        with CaptureQueriesContext(connection) as queries:
+            user = get_user_model().objects.create_superuser(email='admin@example.com', password='Django@123')
+
+        self.assertEqual(sum(query['sql'].startswith('UPDATE') for query in queries), 0)
+        user.refresh_from_db()
+        self.assertEqual(user.profile_img.name, 'profile_images/default_profile.jpg')
+        self.assertEqual(list(user.groups.values_list('name', flat=True)), ['Superuser'])
+
+    def test_save_update_fields_validates_only_updated_fields(self):
+        """Test saving with update_fields skips the unique checks of the other fields"""
+        user = get_user_model().objects.create_user(email='test@example.com', password='Django@123')
+        user.is_phone_verified = True
+
+        with CaptureQueriesContext(connection) as queries:
+            user.save(update_fields=['is_phone_verified'])
+
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('UPDATE'))
+
+    def test_save_update_fields_validates_updated_field(self):
+        """Test the updated fields are still validated"""
+        user = get_user_model().objects.create_user(email='test@example.com', password='Django@123')
+        user.username = 'invalid username'
+
+        with self.assertRaises(ValidationError):
+            user.save(update_fields=['username'])
+
     def test_create_user_without_valid_email(self):
         """Test Creating a user without a proper email"""
         email = 'test'
@@ -203,6 +252,16 @@ class UserModelTests(TestCase):
 
         self.assertEqual(user.slug, slug)
 
+    def test_user_slug_collision(self):
+        """Test a user whose slug is taken is rejected before the insert"""
+        get_user_model().objects.create_user(email='ab@example.com', password='Django@123')
+
+        with self.assertRaises(ValidationError) as context:
+            get_user_model().objects.create_user(email='a.b@example.com', password='Django@123')
+
+        self.assertIn('slug', context.exception.message_dict)
+        self.assertFalse(get_user_model().objects.filter(email='a.b@example.com').exists())
+
 
 class UserModelImageTests(TestCase):
     """Testing Image upload."""
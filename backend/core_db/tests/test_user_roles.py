@@ -0,0 +1,69 @@
+"""Test Cases for User Roles"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from core_db.roles import get_user_role, resolve_role
+
+
+class UserRoleTests(TestCase):
+    """Test role resolution and its cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='Django@123',
+        )
+        self.admin_group, _ = Group.objects.get_or_create(name="Admin")
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_resolve_role_precedence(self):
+        """Test roles are picked in the same precedence order"""
+        self.assertEqual(resolve_role(['Superuser', 'Admin', 'Default']), 'Default')
+        self.assertEqual(resolve_role(['Superuser', 'Admin']), 'Admin')
+        self.assertEqual(resolve_role(['Superuser', 'Other']), 'Superuser')
+        self.assertEqual(resolve_role(['Other']), 'UnAuthorized')
+        self.assertEqual(resolve_role([]), 'UnAuthorized')
+
+    def test_role_resolved_with_single_query(self):
+        """Test the role is resolved with one query and then served from cache"""
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_role(self.user), 'Default')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_role(self.user), 'Default')
+
+    def test_role_invalidated_on_group_add_and_remove(self):
+        """Test membership changes drop the cached role"""
+        self.assertEqual(get_user_role(self.user), 'Default')
+
+        default_group = Group.objects.get(name="Default")
+        self.user.groups.remove(default_group)
+        self.user.groups.add(self.admin_group)
+        self.assertEqual(get_user_role(self.user), 'Admin')
+
+        self.user.groups.clear()
+        self.assertEqual(get_user_role(self.user), 'UnAuthorized')
+
+    def test_role_invalidated_on_reverse_group_change(self):
+        """Test changes made from the group side drop the cached role"""
+        default_group = Group.objects.get(name="Default")
+        self.assertEqual(get_user_role(self.user), 'Default')
+
+        default_group.user_set.clear()
+        self.assertEqual(get_user_role(self.user), 'UnAuthorized')
+
+        self.admin_group.user_set.add(self.user)
+        self.assertEqual(get_user_role(self.user), 'Admin')
+
+    def test_role_invalidated_on_group_rename(self):
+        """Test renaming a group drops the cached role of its members"""
+        default_group = Group.objects.get(name="Default")
+        self.assertEqual(get_user_role(self.user), 'Default')
+
+        default_group.name = 'Superuser'
+        default_group.save()
+        self.assertEqual(get_user_role(self.user), 'Superuser')